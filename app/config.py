@@ -0,0 +1,151 @@
+# Server-wide settings, overridable through environment variables
+import os
+
+def _env_int(name: str, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _env_float(name: str, default):
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def _env_str(name: str, default):
+    value = os.getenv(name)
+    return value if value not in (None, "") else default
+
+# Frame sampling defaults used when an upload does not choose its own policy
+ANALYSIS_TARGET_FPS = _env_float("ZUMBA_ANALYSIS_TARGET_FPS", 10.0)
+ANALYSIS_MAX_FRAMES = _env_int("ZUMBA_ANALYSIS_MAX_FRAMES", 300)
+ANALYSIS_SAMPLING_MODE = _env_str("ZUMBA_ANALYSIS_SAMPLING_MODE", "uniform")
+
+# Background analysis jobs queued by /video/upload
+ANALYSIS_WORKERS = _env_int("ZUMBA_ANALYSIS_WORKERS", 2)
+
+# Inference worker processes, each holding its own copy of the model.
+# 0 workers runs inference inside the web process instead.
+INFERENCE_WORKERS = _env_int("ZUMBA_INFERENCE_WORKERS", 2)
+INFERENCE_INTRA_OP_THREADS = _env_int(
+    "ZUMBA_INFERENCE_INTRA_OP_THREADS",
+    max(1, (os.cpu_count() or 1) // max(1, INFERENCE_WORKERS))
+)
+INFERENCE_INTER_OP_THREADS = _env_int("ZUMBA_INFERENCE_INTER_OP_THREADS", 1)
+
+# Cross-request micro-batching: frames from concurrent jobs are merged into
+# one model batch of up to this many frames, waiting at most this long
+INFERENCE_MAX_BATCH_SIZE = _env_int("ZUMBA_INFERENCE_MAX_BATCH_SIZE", 128)
+INFERENCE_MAX_WAIT_MS = _env_float("ZUMBA_INFERENCE_MAX_WAIT_MS", 10.0)
+
+# Load the model when the server starts instead of on the first upload,
+# and run a dummy batch through it so graph tracing happens up front
+MODEL_PRELOAD = _env_bool("ZUMBA_MODEL_PRELOAD", True)
+MODEL_WARMUP = _env_bool("ZUMBA_MODEL_WARMUP", True)
+
+# Inference backend: keras, tflite, tflite-float16, tflite-int8 or onnx.
+# Each backend has a default artifact under app/models/ unless a path is given;
+# scripts/convert_model.py exports them and checks they agree with Keras.
+INFERENCE_BACKEND = _env_str("ZUMBA_INFERENCE_BACKEND", "keras")
+MODEL_PATH = _env_str("ZUMBA_MODEL_PATH", None)
+
+# Reuse analysis results for byte-identical re-uploads analyzed by the same
+# model version with the same sampling policy
+ANALYSIS_CACHE_ENABLED = _env_bool("ZUMBA_ANALYSIS_CACHE_ENABLED", True)
+ANALYSIS_CACHE_MAX_ENTRIES = _env_int("ZUMBA_ANALYSIS_CACHE_MAX_ENTRIES", 10000)
+# Explicit model version label; by default it is derived from the model file's hash
+MODEL_VERSION = _env_str("ZUMBA_MODEL_VERSION", None)
+
+# Key frames: representative, de-duplicated frames saved to key_frames
+KEYFRAMES_ENABLED = _env_bool("ZUMBA_KEYFRAMES_ENABLED", True)
+KEYFRAMES_MAX = _env_int("ZUMBA_KEYFRAMES_MAX", 30)
+# dHash Hamming distance (out of 64 bits) at or below which two frames are duplicates
+KEYFRAMES_HAMMING_THRESHOLD = _env_int("ZUMBA_KEYFRAMES_HAMMING_THRESHOLD", 6)
+KEYFRAMES_SAVE_IMAGES = _env_bool("ZUMBA_KEYFRAMES_SAVE_IMAGES", True)
+KEYFRAMES_DIR = _env_str("ZUMBA_KEYFRAMES_DIR", "app/uploads/keyframes")
+
+# MediaPipe Pose over each video's key frames, stored in landmarks
+POSE_ENABLED = _env_bool("ZUMBA_POSE_ENABLED", True)
+POSE_MODEL_COMPLEXITY = _env_int("ZUMBA_POSE_MODEL_COMPLEXITY", 1)
+POSE_MIN_DETECTION_CONFIDENCE = _env_float("ZUMBA_POSE_MIN_DETECTION_CONFIDENCE", 0.5)
+# Detections whose mean landmark visibility is below this are not stored
+POSE_MIN_CONFIDENCE = _env_float("ZUMBA_POSE_MIN_CONFIDENCE", 0.5)
+
+# Classifier: "cnn" (zumba_model.h5 on frames), "landmark" (pose landmarks only)
+# or "cascade" (landmarks first, CNN only below the confidence threshold)
+ANALYSIS_MODE = _env_str("ZUMBA_ANALYSIS_MODE", "cnn")
+CASCADE_CONFIDENCE_THRESHOLD = _env_float("ZUMBA_CASCADE_CONFIDENCE_THRESHOLD", 0.8)
+LANDMARK_WINDOW_SEC = _env_float("ZUMBA_LANDMARK_WINDOW_SEC", 2.0)
+# Optional trained softmax-regression weights (W, b) for the landmark classifier
+LANDMARK_MODEL_PATH = _env_str("ZUMBA_LANDMARK_MODEL_PATH", "app/models/landmark_classifier.npz")
+
+# Per-segment timeline: smoothed per-frame predictions split at label changes
+TIMELINE_ENABLED = _env_bool("ZUMBA_TIMELINE_ENABLED", True)
+TIMELINE_SMOOTHING_SEC = _env_float("ZUMBA_TIMELINE_SMOOTHING_SEC", 1.0)
+# Shorter segments are merged into a neighbour
+TIMELINE_MIN_SEGMENT_SEC = _env_float("ZUMBA_TIMELINE_MIN_SEGMENT_SEC", 3.0)
+
+# Optional early exit: stop decoding once the running label has converged.
+# Meant for single-exercise clips; the timeline only covers the analyzed part.
+EARLY_EXIT_ENABLED = _env_bool("ZUMBA_EARLY_EXIT_ENABLED", False)
+EARLY_EXIT_MIN_FRAMES = _env_int("ZUMBA_EARLY_EXIT_MIN_FRAMES", 96)
+# Lead of the top class over the runner-up in the running mean probability
+EARLY_EXIT_MARGIN = _env_float("ZUMBA_EARLY_EXIT_MARGIN", 0.1)
+EARLY_EXIT_STABLE_BATCHES = _env_int("ZUMBA_EARLY_EXIT_STABLE_BATCHES", 3)
+
+# Decode and preprocess run in their own threads ahead of inference,
+# connected by bounded queues (sizes in frames and in batches)
+PIPELINE_ENABLED = _env_bool("ZUMBA_PIPELINE_ENABLED", True)
+PIPELINE_FRAME_QUEUE_SIZE = _env_int("ZUMBA_PIPELINE_FRAME_QUEUE_SIZE", 64)
+PIPELINE_BATCH_QUEUE_SIZE = _env_int("ZUMBA_PIPELINE_BATCH_QUEUE_SIZE", 2)
+
+# Resumable chunked uploads (POST /video/uploads ...)
+CHUNKED_UPLOAD_DIR = _env_str("ZUMBA_CHUNKED_UPLOAD_DIR", "app/uploads/partial")
+# Chunk size suggested to clients; any size is accepted
+CHUNKED_UPLOAD_CHUNK_SIZE = _env_int("ZUMBA_CHUNKED_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+# Sessions without a chunk for this long are garbage-collected
+CHUNKED_UPLOAD_TTL_HOURS = _env_float("ZUMBA_CHUNKED_UPLOAD_TTL_HOURS", 24.0)
+CHUNKED_UPLOAD_GC_INTERVAL_SEC = _env_int("ZUMBA_CHUNKED_UPLOAD_GC_INTERVAL_SEC", 900)
+
+# Uploads over this size are refused while streaming (both upload APIs)
+UPLOAD_MAX_MB = _env_int("ZUMBA_UPLOAD_MAX_MB", 500)
+
+# Low-resolution proxy of each upload, made once at ingest; analysis and
+# previews read it instead of the original. 0 FPS keeps the source rate.
+PROXY_ENABLED = _env_bool("ZUMBA_PROXY_ENABLED", True)
+PROXY_SHORT_SIDE = _env_int("ZUMBA_PROXY_SHORT_SIDE", 256)
+PROXY_FPS = _env_float("ZUMBA_PROXY_FPS", ANALYSIS_TARGET_FPS)
+
+# Optional cache of each video's sampled, resized frames as memory-mapped
+# .npy files, so reanalysis with a new model skips decoding. Least recently
+# used entries are evicted beyond the disk budget.
+FRAME_CACHE_ENABLED = _env_bool("ZUMBA_FRAME_CACHE_ENABLED", False)
+FRAME_CACHE_DIR = _env_str("ZUMBA_FRAME_CACHE_DIR", "app/uploads/frame_cache")
+FRAME_CACHE_MAX_MB = _env_int("ZUMBA_FRAME_CACHE_MAX_MB", 2048)
+
+# Versioned model artifacts; the version named in <dir>/ACTIVE is served
+# instead of MODEL_PATH. Hot swaps wait this long for new workers to load.
+MODEL_REGISTRY_DIR = _env_str("ZUMBA_MODEL_REGISTRY_DIR", "app/models/registry")
+MODEL_SWAP_TIMEOUT_SEC = _env_float("ZUMBA_MODEL_SWAP_TIMEOUT_SEC", 600.0)
+
+# Shadow evaluation: a registered candidate version also analyzes this
+# fraction of uploads, after production and on its own low-priority
+# workers; samples beyond the queue size are dropped
+SHADOW_MODEL_VERSION = _env_str("ZUMBA_SHADOW_MODEL_VERSION", "")
+SHADOW_SAMPLE_RATE = _env_float("ZUMBA_SHADOW_SAMPLE_RATE", 0.1)
+SHADOW_WORKERS = _env_int("ZUMBA_SHADOW_WORKERS", 1)
+SHADOW_MAX_QUEUE = _env_int("ZUMBA_SHADOW_MAX_QUEUE", 20)
+SHADOW_NICENESS = _env_int("ZUMBA_SHADOW_NICENESS", 10)
+
+# Thumbnail and scrubbing sprite sheet per upload, taken from the frames
+# the analysis decodes (webp or jpg; jpg when OpenCV lacks WebP)
+THUMBNAILS_ENABLED = _env_bool("ZUMBA_THUMBNAILS_ENABLED", True)
+THUMBNAILS_DIR = _env_str("ZUMBA_THUMBNAILS_DIR", "app/uploads/thumbnails")
+THUMBNAIL_FORMAT = _env_str("ZUMBA_THUMBNAIL_FORMAT", "webp")
+THUMBNAIL_QUALITY = _env_int("ZUMBA_THUMBNAIL_QUALITY", 80)
+THUMBNAIL_WIDTH = _env_int("ZUMBA_THUMBNAIL_WIDTH", 320)
+SPRITE_TILES = _env_int("ZUMBA_SPRITE_TILES", 20)
+SPRITE_TILE_WIDTH = _env_int("ZUMBA_SPRITE_TILE_WIDTH", 160)
@@ -1,17 +1,67 @@
+import time
 import mysql.connector
 from mysql.connector import Error
+from app.utils.metrics import db_seconds, failures_total
+
+class TimedCursor:
+    """Cursor wrapper that records every statement in zumba_db_seconds"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _timed(self, method, query, params):
+        statement = query.lstrip().split(None, 1)[0].upper() if query.strip() else "OTHER"
+        start = time.perf_counter()
+        try:
+            return method(query) if params is None else method(query, params)
+        finally:
+            db_seconds.observe(time.perf_counter() - start, method.__name__, statement)
+
+    def execute(self, query, params=None):
+        return self._timed(self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_params):
+        return self._timed(self._cursor.executemany, query, seq_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+class TimedConnection:
+    """Connection wrapper whose cursors, commits and rollbacks are timed"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        with db_seconds.time("commit", "COMMIT"):
+            self._conn.commit()
+
+    def rollback(self):
+        with db_seconds.time("rollback", "ROLLBACK"):
+            self._conn.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
 
 def get_connection():
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",         # XAMPP default
-            password="",         # change if you set root password
-            database="zumbafitpro"
-        )
-        return conn
+        with db_seconds.time("connect", "CONNECT"):
+            conn = mysql.connector.connect(
+                host="localhost",
+                user="root",         # XAMPP default
+                password="",         # change if you set root password
+                database="zumbafitpro"
+            )
+        return TimedConnection(conn)
     except Error as e:
         print("❌ DB Connection Error:", e)
+        failures_total.inc("db_connect")
         return None
 
 def close_connection(conn, cursor=None):
@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from app.routers import auth, video, feedback, admin
+from app.utils import chunked_upload, jobs, inference_pool, metrics, shadow
 
 # Create FastAPI app
 app = FastAPI(
@@ -28,6 +30,22 @@ app.include_router(video.router)
 app.include_router(feedback.router)
 app.include_router(admin.router)
 
+@app.on_event("startup")
+async def start_analysis_workers():
+    """Start the inference processes and the background video analysis workers"""
+    inference_pool.start_pool()
+    shadow.start()
+    await jobs.start_workers()
+    chunked_upload.start_gc()
+
+@app.on_event("shutdown")
+async def stop_analysis_workers():
+    """Stop the background video analysis workers and the inference processes"""
+    await chunked_upload.stop_gc()
+    await jobs.stop_workers()
+    await shadow.stop()
+    inference_pool.stop_pool()
+
 @app.get("/")
 def root():
     """Root endpoint"""
@@ -39,6 +57,7 @@ def root():
             "video": "/video", 
             "feedback": "/feedback",
             "admin": "/admin",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
@@ -46,7 +65,16 @@ def root():
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "message": "ZumbaFit Pro API is operational"}
+    return {
+        "status": "healthy",
+        "message": "ZumbaFit Pro API is operational",
+        "model": inference_pool.model_status()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage timings, DB call timings and upload/label/failure counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from dataclasses import asdict
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Response
+from app import config
 from app.db import get_connection, close_connection
+from app.utils import inference_pool, jobs, model_registry, result_cache, shadow, thumbnails
 from typing import Dict, Any
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -68,7 +71,8 @@ def get_recent_videos():
     try:
         cursor.execute("""
             SELECT v.video_id, v.video_name, v.class_label, v.upload_time, 
-                   v.processing_status, u.name as user_name
+                   v.processing_status, v.thumbnail_path, v.sprite_path, v.sprite_tiles,
+                   u.name as user_name
             FROM videos v
             JOIN users u ON v.user_id = u.user_id
             ORDER BY v.upload_time DESC
@@ -83,9 +87,16 @@ def get_recent_videos():
             formatted_videos.append({
                 "video_id": f"#VID-{video['video_id']:04d}",
                 "upload_date": video['upload_time'].strftime("%d/%m/%Y, %H:%M") if video['upload_time'] else "N/A",
-                "analysis_result": video['class_label'].replace('_', ' '),
+                "analysis_result": video['class_label'].replace('_', ' ') if video['class_label'] else "Pending",
                 "status": video['processing_status'],
-                "user_name": video['user_name']
+                "user_name": video['user_name'],
+                # The version query makes the long-cached URL change when the image does
+                "thumbnail_url": (f"/video/{video['video_id']}/thumbnail?v={thumbnails.version(video['thumbnail_path'])}"
+                                  if video['thumbnail_path'] else None),
+                "sprite_url": (f"/video/{video['video_id']}/sprite?v={thumbnails.version(video['sprite_path'])}"
+                               if video['sprite_path'] else None),
+                "sprite_tiles": video['sprite_tiles'],
+                "preview_url": f"/video/{video['video_id']}/preview"
             })
         
         return {"videos": formatted_videos}
@@ -134,3 +145,58 @@ def get_user_stats():
         raise HTTPException(status_code=500, detail=f"Failed to get user stats: {str(e)}")
     finally:
         close_connection(conn, cursor)
+
+@router.get("/inference")
+def get_inference_stats():
+    """Get analysis queue and inference batching metrics"""
+    return {
+        "queued_jobs": jobs.queue_size(),
+        "scheduler": inference_pool.stats(),
+        "result_cache": result_cache.stats()
+    }
+
+@router.get("/models")
+def get_models():
+    """List registered model versions and the state of the last hot swap"""
+    active = model_registry.active_version()
+    return {
+        "versions": [asdict(version) for version in model_registry.list_versions()],
+        "active_version": active.version if active else None,
+        "serving_version": inference_pool.serving_version(),
+        "swap": inference_pool.swap_status()
+    }
+
+def _swap_in_background(spec: model_registry.ModelVersion):
+    try:
+        inference_pool.swap_model(spec)
+    except RuntimeError as e:
+        print(f"❌ Model swap to {spec.version} not started: {e}")
+
+@router.post("/models/{version}/activate", status_code=202)
+def activate_model(version: str, background_tasks: BackgroundTasks, response: Response):
+    """Hot-swap the served model; poll GET /admin/models until the swap is active or failed"""
+    spec = model_registry.get_version(version)
+    if spec is None:
+        raise HTTPException(status_code=404, detail="Model version not found")
+    if inference_pool.swap_status()["state"] == "loading":
+        raise HTTPException(status_code=409, detail="A model swap is already in progress")
+    if inference_pool.serving_version() == version:
+        response.status_code = 200
+        return {"version": version, "state": "active"}
+
+    # Blocks until the new workers are warm, so it runs after the response is sent
+    background_tasks.add_task(_swap_in_background, spec)
+    return {"version": version, "state": "loading"}
+
+@router.get("/shadow")
+def get_shadow_evaluation():
+    """Agreement rate and per-frame latency difference of the shadow model against production"""
+    try:
+        models = shadow.summary()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get shadow evaluation: {str(e)}")
+    return {
+        "shadow_version": inference_pool.shadow_version(),
+        "sample_rate": config.SHADOW_SAMPLE_RATE,
+        "models": models
+    }
@@ -1,89 +1,528 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Form, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse
+from app import config
 from app.db import get_connection, close_connection
-from app.utils.ml_pipeline import analyze_video
-from app.schemas.video_schema import VideoUploadResponse, VideoAnalysis, VideoList
-import shutil
+from app.utils import chunked_upload, jobs, metrics, ml_pipeline, proxy, result_cache, thumbnails, upload_stream
+from app.utils.sampling import SAMPLING_MODES, SamplingPolicy, resolve_policy
+from app.utils.timeline import copy_timeline, decode_segments
+from app.schemas.video_schema import (
+    VideoUploadResponse, VideoStatus, VideoAnalysis, VideoList, TimelineSegment, VideoTimeline,
+    UploadSessionStatus
+)
+import hashlib
 import os
 import uuid
 from typing import Optional
 from datetime import datetime
 
 UPLOAD_DIR = "app/uploads/"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 router = APIRouter(prefix="/video", tags=["Video"])
 
-@router.post("/upload", response_model=VideoUploadResponse)
-async def upload_video(
-    user_id: int = Form(...),
-    file: UploadFile = File(...),
-    exercise_type: Optional[str] = Form(None)
+# Parsed from the request stream by upload_stream, declared here for the API docs
+UPLOAD_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["user_id", "file"],
+            "properties": {
+                "user_id": {"type": "integer"},
+                "file": {"type": "string", "format": "binary", "description": "MP4, MOV or WebM video"},
+                "exercise_type": {"type": "string"},
+                "sample_fps": {"type": "number", "description": "Frames per second to analyze"},
+                "max_frames": {"type": "integer", "description": "Maximum number of frames to analyze"},
+                "sampling_mode": {"type": "string", "description": f"One of: {', '.join(SAMPLING_MODES)}"},
+            },
+        }}},
+    }
+}
+
+def _form_value(fields: dict, name: str, cast, required: bool = False):
+    value = fields.get(name)
+    if value is None or value == "":
+        if required:
+            raise HTTPException(status_code=400, detail=f"Missing form field '{name}'")
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid value for '{name}'")
+
+@router.post("/upload", response_model=VideoUploadResponse, status_code=202, openapi_extra=UPLOAD_FORM_SCHEMA)
+async def upload_video(request: Request, response: Response):
+    """Upload a Zumba video and queue it for analysis.
+
+    The body is streamed to disk as it arrives: uploads over
+    ZUMBA_UPLOAD_MAX_MB or without an MP4/MOV/WebM signature are refused
+    from the first bytes, without waiting for the whole file.
+    """
+    # Written under a temporary name, the original filename is only known once parsed
+    file_id = uuid.uuid4()
+    temp_path = os.path.join(UPLOAD_DIR, f"{file_id}.uploading")
+    
+    try:
+        with metrics.timer("upload_write"):
+            upload = await upload_stream.save_multipart_upload(request, "file", temp_path)
+        
+        user_id = _form_value(upload.fields, "user_id", int, required=True)
+        exercise_type = upload.fields.get("exercise_type") or None
+        # Per-request sampling policy, defaults come from the server config
+        try:
+            policy = resolve_policy(
+                _form_value(upload.fields, "sample_fps", float),
+                _form_value(upload.fields, "max_frames", int),
+                upload.fields.get("sampling_mode") or None
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Generate unique filename
+        filename = f"{file_id}_{os.path.basename(upload.filename)}"
+        file_path = os.path.join(UPLOAD_DIR, filename)
+        os.replace(temp_path, file_path)
+    except Exception as e:
+        metrics.uploads_total.inc("rejected" if isinstance(e, (upload_stream.UploadRejected, HTTPException))
+                                  else "failed")
+        metrics.failures_total.inc("upload")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if isinstance(e, upload_stream.UploadRejected):
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Video upload failed: {str(e)}")
+    
+    return await register_upload(response, user_id, filename, file_path, upload.sha256, exercise_type, policy)
+
+def _insert_video(
+    user_id: int,
+    filename: str,
+    file_path: str,
+    video_sha256: str,
+    exercise_type: Optional[str],
+    policy: SamplingPolicy
 ):
-    """Upload and analyze a Zumba video"""
+    """Insert the upload's videos row; returns (video_id, model version, cached result or None).
+
+    Blocking: hashing the model file on first use, the cache lookup and the
+    insert all wait on disk or MySQL.
+    """
+    model_version = ml_pipeline.model_version()
     
-    # Validate file type
-    if not file.content_type.startswith("video/"):
-        raise HTTPException(status_code=400, detail="Please upload a video file")
+    # A byte-identical upload analyzed by the same model and policy skips inference
+    cached = None
+    if config.ANALYSIS_CACHE_ENABLED and model_version:
+        with metrics.timer("cache_lookup"):
+            cached = result_cache.lookup(video_sha256, model_version, ml_pipeline.analysis_key(policy))
     
-    # Generate unique filename
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    
+    cursor = conn.cursor()
     
     try:
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Analyze video using ML model
-        feedback, predicted_class, confidence = analyze_video(file_path)
-        
-        # Store in database
-        conn = get_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        
-        cursor = conn.cursor()
-        
-        try:
-            # Insert video record
+        if cached:
+            feedback, predicted_class, confidence, _ = cached
             cursor.execute(
                 """INSERT INTO videos 
-                   (user_id, video_name, file_path, class_label, exercise_type, processing_status) 
-                   VALUES (%s, %s, %s, %s, %s, %s)""",
-                (user_id, filename, file_path, predicted_class, exercise_type, "processed")
+                   (user_id, video_name, file_path, video_sha256, class_label, confidence,
+                    frames_analyzed, model_version, exercise_type, processing_status) 
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+                (user_id, filename, file_path, video_sha256, predicted_class, confidence,
+                 0, model_version, exercise_type, "processed")
             )
             video_id = cursor.lastrowid
-            
-            # Insert feedback report
             cursor.execute(
                 """INSERT INTO feedback_reports 
                    (video_id, user_id, feedback_text) 
                    VALUES (%s, %s, %s)""",
                 (video_id, user_id, feedback)
             )
-            
-            conn.commit()
-            
-            return VideoUploadResponse(
-                message="✅ Video uploaded & analyzed successfully",
-                video_id=video_id,
-                feedback=feedback,
-                class_label=predicted_class,
-                confidence=confidence
+        else:
+            # Store a pending record, the analysis workers fill in the result.
+            # The policy is kept with the row, so a requeue after a restart uses it too
+            cursor.execute(
+                """INSERT INTO videos 
+                   (user_id, video_name, file_path, video_sha256, exercise_type, processing_status,
+                    sample_fps, max_frames, sampling_mode) 
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+                (user_id, filename, file_path, video_sha256, exercise_type, "pending",
+                 policy.target_fps, policy.max_frames, policy.mode)
             )
-            
+            video_id = cursor.lastrowid
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        close_connection(conn, cursor)
+    
+    # The upload is not decoded, so it gets the images and segments of the video the result came from
+    source_video_id = cached[3] if cached else None
+    if source_video_id and config.THUMBNAILS_ENABLED:
+        try:
+            thumbnails.copy_thumbnails(source_video_id, video_id)
+        except Exception as e:
+            metrics.failures_total.inc("thumbnails")
+            print(f"❌ Could not copy thumbnails to video {video_id}: {e}")
+    if source_video_id and config.TIMELINE_ENABLED:
+        try:
+            copy_timeline(source_video_id, video_id)
         except Exception as e:
-            conn.rollback()
-            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-        finally:
-            close_connection(conn, cursor)
-            
+            metrics.failures_total.inc("timeline")
+            print(f"❌ Could not copy timeline to video {video_id}: {e}")
+    return video_id, model_version, cached
+
+async def register_upload(
+    response: Response,
+    user_id: int,
+    filename: str,
+    file_path: str,
+    video_sha256: str,
+    exercise_type: Optional[str],
+    policy: SamplingPolicy
+) -> VideoUploadResponse:
+    """Record a stored upload and queue it for analysis, or answer from the result cache"""
+    try:
+        video_id, model_version, cached = await run_in_threadpool(
+            _insert_video, user_id, filename, file_path, video_sha256, exercise_type, policy
+        )
     except Exception as e:
-        # Clean up file if analysis fails
+        metrics.uploads_total.inc("failed")
+        metrics.failures_total.inc("upload")
+        # Clean up file if it could not be stored
         if os.path.exists(file_path):
             os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Video processing failed: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Video upload failed: {str(e)}")
+    
+    if cached:
+        metrics.uploads_total.inc("cached")
+        metrics.labels_total.inc(cached[1])
+        response.status_code = 200
+        return VideoUploadResponse(
+            message="✅ Video uploaded & analyzed successfully",
+            video_id=video_id,
+            processing_status="processed",
+            status_url=f"/video/{video_id}/status"
+        )
+    
+    # The row stays 'pending' if queueing fails and is picked up on the next start
+    try:
+        await jobs.enqueue(jobs.AnalysisJob(
+            video_id, user_id, file_path, policy,
+            video_sha256=video_sha256, model_version=model_version
+        ))
+    except RuntimeError as e:
+        metrics.uploads_total.inc("failed")
+        metrics.failures_total.inc("enqueue")
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    metrics.uploads_total.inc("queued")
+    return VideoUploadResponse(
+        message="✅ Video uploaded, analysis queued",
+        video_id=video_id,
+        processing_status="pending",
+        status_url=f"/video/{video_id}/status"
+    )
+
+def _session_status(session: chunked_upload.UploadSession) -> UploadSessionStatus:
+    ranges = chunked_upload.received_ranges(session.upload_id)
+    return UploadSessionStatus(
+        upload_id=session.upload_id,
+        total_size=session.total_size,
+        chunk_size=config.CHUNKED_UPLOAD_CHUNK_SIZE,
+        bytes_received=sum(end - start for start, end in ranges),
+        received_ranges=[[start, end] for start, end in ranges],
+        complete=chunked_upload.is_complete(session, ranges)
+    )
+
+def _get_session_or_404(upload_id: str) -> chunked_upload.UploadSession:
+    try:
+        session = chunked_upload.get_session(upload_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    return session
+
+@router.post("/uploads", response_model=UploadSessionStatus, status_code=201)
+def initiate_chunked_upload(
+    user_id: int = Form(...),
+    filename: str = Form(...),
+    total_size: int = Form(..., ge=0, description="Size of the whole file in bytes"),
+    content_type: str = Form("video/mp4"),
+    exercise_type: Optional[str] = Form(None),
+    sample_fps: Optional[float] = Form(None, description="Frames per second to analyze"),
+    max_frames: Optional[int] = Form(None, description="Maximum number of frames to analyze"),
+    sampling_mode: Optional[str] = Form(None, description=f"One of: {', '.join(SAMPLING_MODES)}")
+):
+    """Start a resumable upload; send the file with PUT /video/uploads/{upload_id}?offset=N"""
+    if not content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="Please upload a video file")
+    if total_size > upload_stream.max_upload_bytes():
+        raise HTTPException(status_code=413, detail=f"Video is larger than {config.UPLOAD_MAX_MB} MB")
+    
+    # Rejected now rather than after the whole file has been sent
+    try:
+        resolve_policy(sample_fps, max_frames, sampling_mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        session = chunked_upload.create_session(chunked_upload.UploadSession(
+            upload_id="", user_id=user_id, file_name=os.path.basename(filename), total_size=total_size,
+            exercise_type=exercise_type, sample_fps=sample_fps, max_frames=max_frames,
+            sampling_mode=sampling_mode
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not start upload: {str(e)}")
+    
+    return _session_status(session)
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionStatus)
+async def upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """Write the request body at byte offset; chunks may arrive in any order and be retried"""
+    length = request.headers.get("content-length")
+    if length is not None:
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+    
+    # The body is streamed, so this handler stays async and its DB calls go to the threadpool
+    session = await run_in_threadpool(_get_session_or_404, upload_id)
+    
+    # Refuse before writing anything, so an oversized chunk cannot clobber received bytes
+    if length is not None and offset + length > session.total_size:
+        raise HTTPException(
+            status_code=416,
+            detail=f"Chunk runs past the declared size of {session.total_size} bytes"
+        )
+    
+    try:
+        with metrics.timer("upload_chunk"):
+            await chunked_upload.write_chunk(session, offset, request.stream())
+    except upload_stream.UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except ValueError as e:
+        raise HTTPException(status_code=416, detail=str(e))
+    except Exception as e:
+        metrics.failures_total.inc("upload_chunk")
+        raise HTTPException(status_code=500, detail=f"Could not store chunk: {str(e)}")
+    
+    return await run_in_threadpool(_session_status, session)
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionStatus)
+def get_chunked_upload(upload_id: str):
+    """Byte ranges received so far, so an interrupted client resumes with the missing ones"""
+    return _session_status(_get_session_or_404(upload_id))
+
+@router.post("/uploads/{upload_id}/finalize", response_model=VideoUploadResponse, status_code=202)
+async def finalize_chunked_upload(upload_id: str, response: Response):
+    """Hand a completely received upload to the normal analysis flow"""
+    session = await run_in_threadpool(_get_session_or_404, upload_id)
+    ranges = await run_in_threadpool(chunked_upload.received_ranges, upload_id)
+    if not chunked_upload.is_complete(session, ranges):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incomplete: received {[[start, end] for start, end in ranges]} of {session.total_size} bytes"
+        )
+    
+    policy = resolve_policy(session.sample_fps, session.max_frames, session.sampling_mode)
+    filename = f"{uuid.uuid4()}_{session.file_name}"
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    
+    # Deleting the session claims the upload: a concurrent finalize finds it gone
+    try:
+        claimed = await run_in_threadpool(chunked_upload.delete_session, upload_id, False)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not claimed:
+        raise HTTPException(status_code=409, detail="Upload is already being finalized")
+    
+    try:
+        # A rename, the assembled bytes are not copied again
+        await run_in_threadpool(os.replace, chunked_upload.partial_path(upload_id), file_path)
+        video_sha256 = await run_in_threadpool(_hash_file, file_path)
+    except Exception as e:
+        metrics.uploads_total.inc("failed")
+        metrics.failures_total.inc("upload")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(status_code=500, detail=f"Video upload failed: {str(e)}")
+    
+    return await register_upload(response, session.user_id, filename, file_path, video_sha256,
+                                 session.exercise_type, policy)
+
+@router.delete("/uploads/{upload_id}")
+def abort_chunked_upload(upload_id: str):
+    """Discard a chunked upload and its partial file"""
+    _get_session_or_404(upload_id)
+    chunked_upload.delete_session(upload_id)
+    return {"message": "Upload discarded"}
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@router.get("/{video_id}/status", response_model=VideoStatus)
+def get_video_status(video_id: int):
+    """Poll the analysis status of an uploaded video"""
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute(
+            """SELECT v.video_id, v.processing_status, v.class_label, v.confidence,
+                      v.frames_analyzed, fr.feedback_text
+               FROM videos v
+               LEFT JOIN feedback_reports fr ON v.video_id = fr.video_id
+               WHERE v.video_id = %s""",
+            (video_id,)
+        )
+        
+        video = cursor.fetchone()
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+        
+        return VideoStatus(
+            video_id=video["video_id"],
+            processing_status=video["processing_status"],
+            class_label=video["class_label"],
+            confidence=video["confidence"],
+            frames_analyzed=video["frames_analyzed"],
+            feedback=video["feedback_text"]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch video status: {str(e)}")
+    finally:
+        close_connection(conn, cursor)
+
+@router.get("/{video_id}/timeline", response_model=VideoTimeline)
+def get_video_timeline(video_id: int):
+    """Exercise segments of a video with per-segment feedback (empty until analyzed)"""
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute(
+            """SELECT v.video_id, v.processing_status, t.segments
+               FROM videos v
+               LEFT JOIN video_timelines t ON v.video_id = t.video_id
+               WHERE v.video_id = %s""",
+            (video_id,)
+        )
+        
+        video = cursor.fetchone()
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+        
+        segments = decode_segments(video["segments"]) if video["segments"] else []
+        return VideoTimeline(
+            video_id=video["video_id"],
+            processing_status=video["processing_status"],
+            segments=[
+                TimelineSegment(
+                    start_sec=segment.start_sec,
+                    end_sec=segment.end_sec,
+                    class_label=segment.label,
+                    confidence=segment.confidence,
+                    feedback=ml_pipeline.generate_feedback(segment.label, segment.confidence)
+                )
+                for segment in segments
+            ]
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch video timeline: {str(e)}")
+    finally:
+        close_connection(conn, cursor)
+
+@router.get("/{video_id}/preview")
+def get_video_preview(video_id: int):
+    """Play back a video from its low-resolution proxy (the original until the proxy exists)"""
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute(
+            "SELECT file_path, proxy_path FROM videos WHERE video_id = %s",
+            (video_id,)
+        )
+        video = cursor.fetchone()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch video: {str(e)}")
+    finally:
+        close_connection(conn, cursor)
+    
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    path = proxy.preview_path(video["file_path"], video["proxy_path"])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Video file not found")
+    return FileResponse(path)
+
+# Image file names change with their content, so clients may keep them forever
+IMMUTABLE_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+def _image_response(video_id: int, column: str) -> FileResponse:
+    conn = get_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Database connection failed")
+    
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute(f"SELECT {column} FROM videos WHERE video_id = %s", (video_id,))
+        video = cursor.fetchone()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch video: {str(e)}")
+    finally:
+        close_connection(conn, cursor)
+    
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    path = video[column]
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Image not generated yet")
+    return FileResponse(path, media_type=thumbnails.MEDIA_TYPES.get(os.path.splitext(path)[1]),
+                        headers=IMMUTABLE_CACHE_HEADERS)
+
+@router.get("/{video_id}/thumbnail")
+def get_video_thumbnail(video_id: int):
+    """Poster image of a video, made from the frames decoded during analysis"""
+    return _image_response(video_id, "thumbnail_path")
+
+@router.get("/{video_id}/sprite")
+def get_video_sprite(video_id: int):
+    """Sprite sheet for scrubbing: sprite_tiles evenly spaced frames in one row"""
+    return _image_response(video_id, "sprite_path")
 
 @router.get("/user/{user_id}", response_model=VideoList)
 def get_user_videos(
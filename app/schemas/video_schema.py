@@ -5,14 +5,21 @@ from datetime import datetime
 class VideoUploadResponse(BaseModel):
     message: str
     video_id: int
-    feedback: str
-    class_label: str
-    confidence: float
+    processing_status: str
+    status_url: str
+
+class VideoStatus(BaseModel):
+    video_id: int
+    processing_status: str
+    class_label: Optional[str] = None
+    confidence: Optional[float] = None
+    frames_analyzed: Optional[int] = None  # 0 when served from the analysis cache
+    feedback: Optional[str] = None
 
 class VideoAnalysis(BaseModel):
     video_id: int
     user_id: int
-    class_label: str
+    class_label: Optional[str]
     feedback_text: str
     processing_status: str
     upload_time: datetime
@@ -20,3 +27,23 @@ class VideoAnalysis(BaseModel):
 class VideoList(BaseModel):
     videos: list[VideoAnalysis]
     total_count: int
+
+class TimelineSegment(BaseModel):
+    start_sec: float
+    end_sec: float
+    class_label: str
+    confidence: float
+    feedback: str
+
+class VideoTimeline(BaseModel):
+    video_id: int
+    processing_status: str
+    segments: list[TimelineSegment]
+
+class UploadSessionStatus(BaseModel):
+    upload_id: str
+    total_size: int
+    chunk_size: int  # Suggested chunk size
+    bytes_received: int
+    received_ranges: list[list[int]]  # [start, end) byte ranges
+    complete: bool
@@ -0,0 +1,117 @@
+import os
+import numpy as np
+from typing import Dict, Optional, Type
+
+# Default artifact for each backend; scripts/convert_model.py writes all of them
+DEFAULT_MODEL_PATHS = {
+    "keras": "app/models/zumba_model.h5",
+    "tflite": "app/models/zumba_model.tflite",
+    "tflite-float16": "app/models/zumba_model_float16.tflite",
+    "tflite-int8": "app/models/zumba_model_int8.tflite",
+    "onnx": "app/models/zumba_model.onnx",
+}
+
+class InferenceBackend:
+    """Runs the posture classifier on float32 frame batches scaled to [0, 1]"""
+    name = "base"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Return one row of class probabilities per frame"""
+        raise NotImplementedError
+
+class KerasBackend(InferenceBackend):
+    name = "keras"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        super().__init__(model_path, num_threads)
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # predict_on_batch skips the per-call dataset setup of predict()
+        return np.asarray(self.model.predict_on_batch(batch))
+
+class TFLiteBackend(InferenceBackend):
+    """TensorFlow Lite interpreter, for float32, float16 or int8 quantized exports"""
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        super().__init__(model_path, num_threads)
+        try:
+            # The standalone runtime is a few MB against TensorFlow's few hundred
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input["shape"][0])
+
+    def _quantize(self, batch: np.ndarray) -> np.ndarray:
+        scale, zero_point = self.input["quantization"]
+        if self.input["dtype"] == np.float32 or not scale:
+            return batch.astype(self.input["dtype"], copy=False)
+        limits = np.iinfo(self.input["dtype"])
+        return np.clip(np.round(batch / scale + zero_point), limits.min, limits.max).astype(self.input["dtype"])
+
+    def _dequantize(self, preds: np.ndarray) -> np.ndarray:
+        scale, zero_point = self.output["quantization"]
+        if self.output["dtype"] == np.float32 or not scale:
+            return preds.astype(np.float32, copy=False)
+        return (preds.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Tensors are only reallocated when the batch size changes
+        if len(batch) != self._batch_size:
+            self.interpreter.resize_tensor_input(self.input["index"], [len(batch), *batch.shape[1:]])
+            self.interpreter.allocate_tensors()
+            self.input = self.interpreter.get_input_details()[0]
+            self.output = self.interpreter.get_output_details()[0]
+            self._batch_size = len(batch)
+        self.interpreter.set_tensor(self.input["index"], self._quantize(batch))
+        self.interpreter.invoke()
+        return self._dequantize(self.interpreter.get_tensor(self.output["index"]))
+
+class OnnxBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        super().__init__(model_path, num_threads)
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The onnx backend needs onnxruntime (pip install onnxruntime)")
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch.astype(np.float32, copy=False)})[0]
+
+BACKENDS: Dict[str, Type[InferenceBackend]] = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "tflite-float16": TFLiteBackend,
+    "tflite-int8": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+def load_backend(name: str, model_path: Optional[str] = None, num_threads: Optional[int] = None) -> InferenceBackend:
+    """Load the named backend from model_path (or that backend's default artifact)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', choose one of: {', '.join(BACKENDS)}")
+    model_path = model_path or DEFAULT_MODEL_PATHS[name]
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+    backend = BACKENDS[name](model_path, num_threads)
+    backend.name = name
+    return backend
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Tuple
+import numpy as np
+
+class MicroBatcher:
+    """Merges frame batches from concurrent analysis jobs into larger model batches.
+
+    Jobs call predict() with their own (small) batch and block until the
+    rows for their frames come back. A dispatcher thread collects pending
+    requests until max_batch_size frames are waiting or the oldest request
+    has waited max_wait_ms, then hands the merged batch to dispatch_fn.
+    dispatch_fn must return a Future of (predictions, seconds), seconds
+    being the model's own time on the merged batch; at most max_in_flight
+    merged batches run at a time, so requests keep accumulating (and
+    batches fill up) while every worker is busy.
+    """
+
+    def __init__(
+        self,
+        dispatch_fn: Callable[[np.ndarray], Future],
+        max_batch_size: int = 128,
+        max_wait_ms: float = 10.0,
+        max_in_flight: int = 1
+    ):
+        self.dispatch_fn = dispatch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._slots = threading.Semaphore(max(1, max_in_flight))
+        self._pending: Deque[Tuple[np.ndarray, Future, float]] = deque()
+        self._pending_frames = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Tuning metrics
+        self._batches = 0
+        self._frames = 0
+        self._requests = 0
+        self._wait_total = 0.0
+        self._in_flight = 0
+
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, frames: np.ndarray) -> Future:
+        """Queue frames for prediction.
+
+        The Future resolves to (one row per frame, the share of the merged
+        batch's model time that falls on these frames).
+        """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Inference scheduler is shut down")
+            self._pending.append((frames, future, time.monotonic()))
+            self._pending_frames += len(frames)
+            self._cond.notify()
+        return future
+
+    def predict(self, frames: np.ndarray) -> np.ndarray:
+        """Blocking submit(), usable as an analyze_video predict_fn"""
+        return self.submit(frames).result()[0]
+
+    def close(self):
+        """Stop the dispatcher; requests still queued fail"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        with self._cond:
+            while self._pending:
+                _, future, _ = self._pending.popleft()
+                future.set_exception(RuntimeError("Inference scheduler is shut down"))
+            self._pending_frames = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth and batch-fill metrics for tuning batch size and wait time"""
+        with self._cond:
+            return {
+                "queue_depth_requests": len(self._pending),
+                "queue_depth_frames": self._pending_frames,
+                "in_flight_batches": self._in_flight,
+                "batches": self._batches,
+                "frames": self._frames,
+                "requests": self._requests,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "avg_batch_size": self._frames / self._batches if self._batches else 0.0,
+                "avg_batch_fill": (self._frames / (self._batches * self.max_batch_size)
+                                   if self._batches else 0.0),
+                "avg_queue_wait_ms": (self._wait_total / self._requests * 1000.0
+                                      if self._requests else 0.0),
+            }
+
+    def _take_batch(self) -> List[Tuple[np.ndarray, Future, float]]:
+        """Wait for a full batch or the oldest request's deadline; caller holds the lock"""
+        while not self._pending and not self._closed:
+            self._cond.wait()
+        if self._closed:
+            return []
+
+        deadline = self._pending[0][2] + self.max_wait
+        while self._pending_frames < self.max_batch_size and not self._closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        batch = []
+        size = 0
+        while self._pending:
+            frames = self._pending[0][0]
+            # A request is never split; an oversized one runs as its own batch
+            if batch and size + len(frames) > self.max_batch_size:
+                break
+            batch.append(self._pending.popleft())
+            size += len(frames)
+        self._pending_frames -= size
+        return batch
+
+    def _run(self):
+        while True:
+            # Only form a batch once a worker is free to take it
+            self._slots.acquire()
+            with self._cond:
+                batch = self._take_batch()
+                if not batch:
+                    self._slots.release()
+                    return
+                now = time.monotonic()
+                self._batches += 1
+                self._requests += len(batch)
+                self._frames += sum(len(frames) for frames, _, _ in batch)
+                self._wait_total += sum(now - queued for _, _, queued in batch)
+                self._in_flight += 1
+
+            try:
+                merged = batch[0][0] if len(batch) == 1 else np.concatenate([frames for frames, _, _ in batch])
+                result = self.dispatch_fn(merged)
+            except Exception as e:
+                self._finish(batch, None, e)
+                continue
+            result.add_done_callback(lambda f, batch=batch: self._finish(batch, f, None))
+
+    def _finish(self, batch, result: Future, error: Exception):
+        with self._cond:
+            self._in_flight -= 1
+        self._slots.release()
+
+        if error is None:
+            # exception() raises CancelledError on a cancelled future (pool shutdown or swap teardown)
+            error = (RuntimeError("Inference batch was cancelled") if result.cancelled()
+                     else result.exception())
+        if error is not None:
+            for _, future, _ in batch:
+                future.set_exception(error)
+            return
+
+        # Route each job its own slice of the merged predictions and of the model time
+        preds, seconds = result.result()
+        offset = 0
+        for frames, future, _ in batch:
+            future.set_result((preds[offset:offset + len(frames)], seconds * len(frames) / len(preds)))
+            offset += len(frames)
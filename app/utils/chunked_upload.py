@@ -0,0 +1,258 @@
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app import config
+from app.db import get_connection, close_connection
+from app.utils.upload_stream import SNIFF_BYTES, check_container
+
+# Resumable uploads: the client initiates a session, PUTs chunks at byte
+# offsets in any order (retrying only what failed), then finalizes. Chunks
+# are written straight into a preallocated file at their offsets; the
+# byte ranges received so far are tracked in upload_chunks.
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    user_id: int
+    file_name: str
+    total_size: int
+    exercise_type: Optional[str] = None
+    sample_fps: Optional[float] = None
+    max_frames: Optional[int] = None
+    sampling_mode: Optional[str] = None
+
+def partial_path(upload_id: str) -> str:
+    return os.path.join(config.CHUNKED_UPLOAD_DIR, f"{upload_id}.part")
+
+def create_session(session: UploadSession) -> UploadSession:
+    """Preallocate the partial file and store the session; upload_id is assigned here"""
+    session.upload_id = uuid.uuid4().hex
+    os.makedirs(config.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    # Sparse on most filesystems, so nothing is written until chunks arrive
+    with open(partial_path(session.upload_id), "wb") as f:
+        f.truncate(session.total_size)
+
+    conn = get_connection()
+    if not conn:
+        os.remove(partial_path(session.upload_id))
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """INSERT INTO upload_sessions
+               (upload_id, user_id, file_name, total_size, exercise_type, sample_fps, max_frames, sampling_mode)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+            (session.upload_id, session.user_id, session.file_name, session.total_size,
+             session.exercise_type, session.sample_fps, session.max_frames, session.sampling_mode)
+        )
+        conn.commit()
+        return session
+    except Exception:
+        conn.rollback()
+        os.remove(partial_path(session.upload_id))
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+def get_session(upload_id: str) -> Optional[UploadSession]:
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute(
+            """SELECT upload_id, user_id, file_name, total_size, exercise_type,
+                      sample_fps, max_frames, sampling_mode
+               FROM upload_sessions WHERE upload_id = %s""",
+            (upload_id,)
+        )
+        row = cursor.fetchone()
+        return UploadSession(**row) if row else None
+    finally:
+        close_connection(conn, cursor)
+
+async def write_chunk(session: UploadSession, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """Write a streamed chunk at offset in the partial file; returns the bytes written.
+
+    Raises ValueError if the chunk runs past the declared total size and
+    UploadRejected if the chunk at offset 0 does not start like an MP4,
+    MOV or WebM file; the range is only recorded once the whole chunk has
+    been written. File writes and the DB update run in the threadpool.
+    """
+    if offset < 0 or offset > session.total_size:
+        raise ValueError(f"Offset must be between 0 and {session.total_size}")
+
+    written = 0
+    # The first chunk is held back until its signature has been checked
+    head = b"" if offset == 0 else None
+    with open(partial_path(session.upload_id), "r+b") as f:
+        f.seek(offset)
+        async for data in chunks:
+            if offset + written + len(head or b"") + len(data) > session.total_size:
+                raise ValueError(f"Chunk runs past the declared size of {session.total_size} bytes")
+            if head is not None:
+                head += data
+                if len(head) < SNIFF_BYTES:
+                    continue
+                check_container(head)
+                data, head = head, None
+            await run_in_threadpool(f.write, data)
+            written += len(data)
+        if head:
+            check_container(head)
+            await run_in_threadpool(f.write, head)
+            written += len(head)
+
+    if written:
+        await run_in_threadpool(record_chunk, session.upload_id, offset, offset + written)
+    return written
+
+def record_chunk(upload_id: str, start: int, end: int):
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """INSERT INTO upload_chunks (upload_id, start_offset, end_offset)
+               VALUES (%s, %s, %s)
+               ON DUPLICATE KEY UPDATE end_offset = GREATEST(end_offset, VALUES(end_offset))""",
+            (upload_id, start, end)
+        )
+        # Keeps an active upload from being garbage-collected
+        cursor.execute(
+            "UPDATE upload_sessions SET updated_at = CURRENT_TIMESTAMP WHERE upload_id = %s",
+            (upload_id,)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping or touching [start, end) ranges"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def received_ranges(upload_id: str) -> List[Tuple[int, int]]:
+    """Byte ranges received so far, merged, as [start, end)"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "SELECT start_offset, end_offset FROM upload_chunks WHERE upload_id = %s",
+            (upload_id,)
+        )
+        return merge_ranges([(int(start), int(end)) for start, end in cursor.fetchall()])
+    finally:
+        close_connection(conn, cursor)
+
+def is_complete(session: UploadSession, ranges: List[Tuple[int, int]]) -> bool:
+    return ranges == [(0, session.total_size)] or (session.total_size == 0 and not ranges)
+
+def delete_session(upload_id: str, remove_file: bool = True) -> bool:
+    """Drop a session's rows (chunks cascade) and, unless it was finalized, its partial file.
+
+    Returns False when the session was already gone, so of two concurrent
+    callers exactly one sees True.
+    """
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("DELETE FROM upload_sessions WHERE upload_id = %s", (upload_id,))
+        deleted = cursor.rowcount > 0
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+    if remove_file and os.path.exists(partial_path(upload_id)):
+        os.remove(partial_path(upload_id))
+    return deleted
+
+def collect_expired(ttl_hours: float = config.CHUNKED_UPLOAD_TTL_HOURS) -> int:
+    """Delete sessions without activity for ttl_hours, and orphaned partial files; returns sessions removed"""
+    conn = get_connection()
+    if not conn:
+        return 0
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """SELECT upload_id FROM upload_sessions
+               WHERE updated_at < NOW() - INTERVAL %s SECOND""",
+            (int(ttl_hours * 3600),)
+        )
+        expired = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT upload_id FROM upload_sessions")
+        active = {row[0] for row in cursor.fetchall()} - set(expired)
+    finally:
+        close_connection(conn, cursor)
+
+    for upload_id in expired:
+        delete_session(upload_id)
+
+    # Old partial files whose session row is gone (e.g. a crash in between)
+    if os.path.isdir(config.CHUNKED_UPLOAD_DIR):
+        cutoff = time.time() - ttl_hours * 3600
+        for name in os.listdir(config.CHUNKED_UPLOAD_DIR):
+            path = os.path.join(config.CHUNKED_UPLOAD_DIR, name)
+            if (name.endswith(".part") and name[:-len(".part")] not in active
+                    and os.path.getmtime(path) < cutoff):
+                os.remove(path)
+
+    return len(expired)
+
+_gc_task: Optional[asyncio.Task] = None
+
+async def _gc_loop():
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            removed = await loop.run_in_executor(None, collect_expired)
+            if removed:
+                print(f"✅ Removed {removed} abandoned chunked uploads")
+        except Exception as e:
+            print(f"❌ Chunked upload cleanup failed: {e}")
+        await asyncio.sleep(config.CHUNKED_UPLOAD_GC_INTERVAL_SEC)
+
+def start_gc():
+    """Periodically garbage-collect abandoned partial uploads"""
+    global _gc_task
+    if _gc_task is None:
+        _gc_task = asyncio.create_task(_gc_loop())
+
+async def stop_gc():
+    global _gc_task
+    if _gc_task:
+        _gc_task.cancel()
+        await asyncio.gather(_gc_task, return_exceptions=True)
+        _gc_task = None
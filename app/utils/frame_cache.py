@@ -0,0 +1,151 @@
+import glob
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+import cv2
+import numpy as np
+from app import config
+from app.utils.sampling import SamplingPolicy, sampled_frame_count
+
+# Decoded-frame cache: the sampled, resized uint8 frames of a video, keyed by
+# video_id and everything that decides which pixels they hold (source file,
+# sampling policy, input size). Each entry is two files in FRAME_CACHE_DIR:
+#   <video_id>-<digest>.npy     frames, N x H x W x 3, memory-mapped on read
+#   <video_id>-<digest>.ts.npy  timestamps; its length is the number of valid frames
+# The frames file is preallocated from the container's frame count and may
+# have unused rows at the end. File mtimes order entries for LRU eviction.
+
+_evict_lock = threading.Lock()
+
+def _entry_base(video_id: int, file_path: str, policy: SamplingPolicy, size: Tuple[int, int]) -> str:
+    source = f"{os.path.basename(file_path)}:{policy.key()}:{size[0]}x{size[1]}"
+    digest = hashlib.sha1(source.encode()).hexdigest()[:16]
+    return os.path.join(config.FRAME_CACHE_DIR, f"{video_id}-{digest}")
+
+def budget_bytes() -> int:
+    return config.FRAME_CACHE_MAX_MB * 1024 * 1024
+
+@dataclass
+class CachedFrames:
+    frames: np.ndarray      # Read-only memmap
+    timestamps: np.ndarray
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def batches(self, batch_size: int) -> Iterator[np.ndarray]:
+        """Slices of the memmap, no decode and no copy"""
+        for start in range(0, len(self), batch_size):
+            yield self.frames[start:start + batch_size]
+
+def load(video_id: int, file_path: str, policy: SamplingPolicy, size: Tuple[int, int]) -> Optional[CachedFrames]:
+    """The cached frames of a video, or None on a miss"""
+    base = _entry_base(video_id, file_path, policy, size)
+    try:
+        timestamps = np.load(f"{base}.ts.npy")
+        frames = np.load(f"{base}.npy", mmap_mode="r")
+        # Marks the entry as recently used
+        os.utime(f"{base}.npy")
+    except (OSError, ValueError):
+        return None
+    if len(frames) < len(timestamps):
+        return None
+    return CachedFrames(frames[:len(timestamps)], timestamps)
+
+class FrameCacheWriter:
+    """Copies the batches of one analysis into a new cache entry.
+
+    Nothing is visible to load() until commit(); an analysis that ends
+    early or fails calls discard() instead.
+    """
+
+    def __init__(self, base: str, capacity: int, size: Tuple[int, int]):
+        self.base = base
+        self._temp_base = f"{base}.{os.getpid()}-{threading.get_ident()}.tmp"
+        self._frames = np.lib.format.open_memmap(
+            f"{self._temp_base}.npy", mode="w+", dtype=np.uint8, shape=(capacity, size[1], size[0], 3)
+        )
+        self._timestamps = []
+
+    def write(self, batch: np.ndarray, timestamps):
+        """Append a batch; a full disk or an under-reported frame count drops the entry, not the analysis"""
+        if self._frames is None:
+            return
+        start = len(self._timestamps)
+        if start + len(batch) > len(self._frames):
+            self.discard()
+            return
+        try:
+            self._frames[start:start + len(batch)] = batch
+        except OSError as e:
+            print(f"⚠️ Frame cache write failed: {e}")
+            self.discard()
+            return
+        self._timestamps.extend(timestamps)
+
+    def commit(self):
+        if self._frames is None:
+            return
+        try:
+            self._frames.flush()
+            self._frames = None
+            np.save(f"{self._temp_base}.ts.npy", np.asarray(self._timestamps, dtype=np.float64))
+            # Frames last: an entry counts as present once its frames file exists
+            os.replace(f"{self._temp_base}.ts.npy", f"{self.base}.ts.npy")
+            os.replace(f"{self._temp_base}.npy", f"{self.base}.npy")
+        except OSError as e:
+            print(f"⚠️ Frame cache write failed: {e}")
+            self.discard()
+            return
+        evict()
+
+    def discard(self):
+        self._frames = None
+        for path in (f"{self._temp_base}.npy", f"{self._temp_base}.ts.npy"):
+            if os.path.exists(path):
+                os.remove(path)
+
+def open_writer(video_id: int, file_path: str, policy: SamplingPolicy, cap,
+                size: Tuple[int, int]) -> Optional[FrameCacheWriter]:
+    """A writer for a video about to be decoded from cap, or None if it cannot be cached"""
+    capacity = sampled_frame_count(
+        policy, int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0), cap.get(cv2.CAP_PROP_FPS) or 0.0
+    )
+    if capacity <= 0 or capacity * size[0] * size[1] * 3 > budget_bytes():
+        return None
+    try:
+        os.makedirs(config.FRAME_CACHE_DIR, exist_ok=True)
+        return FrameCacheWriter(_entry_base(video_id, file_path, policy, size), capacity, size)
+    except OSError as e:
+        print(f"⚠️ Frame cache unavailable: {e}")
+        return None
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """Remove least recently used entries until the cache fits max_bytes; returns entries removed"""
+    max_bytes = budget_bytes() if max_bytes is None else max_bytes
+    with _evict_lock:
+        entries = []
+        for frames_path in glob.glob(os.path.join(config.FRAME_CACHE_DIR, "*.npy")):
+            if frames_path.endswith(".ts.npy") or frames_path.endswith(".tmp.npy"):
+                continue
+            base = frames_path[:-len(".npy")]
+            try:
+                stat = os.stat(frames_path)
+                size = stat.st_size + os.path.getsize(f"{base}.ts.npy")
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, size, base))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, base in sorted(entries):
+            if total <= max_bytes:
+                break
+            for path in (f"{base}.npy", f"{base}.ts.npy"):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+            removed += 1
+        return removed
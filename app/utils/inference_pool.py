@@ -0,0 +1,431 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app import config
+from app.utils.batching import MicroBatcher
+from app.utils.model_registry import ModelVersion
+from app.utils.sampling import SamplingPolicy
+
+# Each model version is served by a generation: its own model-holding worker
+# processes (or one local thread when configured with 0 workers) behind its
+# own micro-batching scheduler. A hot swap starts a new generation, switches
+# new analyses to it once it is warm, and closes the old one after the
+# analyses still running on it finish. A shadow generation serves a
+# candidate model on its own, lower-priority workers (see shadow.py).
+
+@dataclass
+class _Generation:
+    id: int
+    model: ModelVersion
+    num_workers: int
+    niceness: int = 0
+    scheduler: Optional[MicroBatcher] = None
+    executor: Optional[ProcessPoolExecutor] = None
+    local_executor: Optional[ThreadPoolExecutor] = None
+    local_model: object = None
+    # Load and warm-up timings of the local model
+    local_status: dict = field(default_factory=dict)
+    in_flight: int = 0
+    retired: bool = False
+    closed: bool = False
+
+_current: Optional[_Generation] = None
+_shadow: Optional[_Generation] = None
+_generations: List[_Generation] = []
+_generation_ids = itertools.count(1)
+_lock = threading.Lock()
+# Decode and preprocessing for each job runs here, predictions go through the scheduler
+_decode_executor: Optional[ThreadPoolExecutor] = None
+_shadow_decode_executor: Optional[ThreadPoolExecutor] = None
+_pool_args = ()
+_scheduler_args = ()
+_restart_lock = threading.Lock()
+# Workers report their model load / warm-up timings here once they are up
+_status_queue = None
+# Written by the status drain and read by /health from other threads; guarded by _lock
+_worker_status: Dict[int, dict] = {}
+_swap_lock = threading.Lock()
+_swap_status = {"state": "idle", "version": None, "error": None, "seconds": None}
+
+def _init_worker(intra_op_threads: int, inter_op_threads: int, warmup: bool, status_queue,
+                 generation_id: int, spec: ModelVersion, niceness: int):
+    """Runs once in every worker process before it accepts work"""
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+    # Thread pools must be sized before the runtime creates them, so the
+    # environment is set first and the model is imported last
+    os.environ["OMP_NUM_THREADS"] = str(intra_op_threads)
+
+    import cv2
+    cv2.setNumThreads(1)
+    if spec.backend == "keras":
+        # Only Keras needs TensorFlow's own pools; the other backends size
+        # theirs from num_threads and never import the full TensorFlow
+        os.environ["TF_NUM_INTRAOP_THREADS"] = str(intra_op_threads)
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+    # The generation's model is loaded once for this process
+    from app.utils import ml_pipeline
+    ml_pipeline.load_model(spec, intra_op_threads)
+    if warmup:
+        ml_pipeline.warm_up()
+    status_queue.put({"pid": os.getpid(), "generation": generation_id, **ml_pipeline.model_status})
+
+def _ping() -> int:
+    return os.getpid()
+
+def _load_local(generation: _Generation, warmup: bool):
+    from app.utils import ml_pipeline
+    status = generation.local_status
+    status.update(backend=generation.model.backend, version=generation.model.version)
+    start = time.perf_counter()
+    try:
+        generation.local_model = ml_pipeline.open_model(generation.model)
+        status.update(loaded=True, error=None)
+        print(f"✅ Model {generation.model.version} loaded successfully ({generation.model.backend} backend)")
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+        print("⚠️  Video analysis will be simulated")
+        status.update(loaded=False, error=str(e))
+    status["load_seconds"] = round(time.perf_counter() - start, 3)
+
+    if generation.local_model is not None and warmup:
+        start = time.perf_counter()
+        generation.local_model.predict(
+            ml_pipeline.normalize_batch(np.zeros((ml_pipeline.BATCH_SIZE, *ml_pipeline.INPUT_SIZE, 3), dtype=np.uint8))
+        )
+        status["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        print(f"✅ Model warmed up in {status['warmup_seconds']}s")
+
+# Both return (predictions, seconds) with the model's own time on the batch,
+# which is comparable between generations whatever their priority or queueing
+
+def _predict(batch: np.ndarray) -> Tuple[np.ndarray, float]:
+    from app.utils.ml_pipeline import predict_batch
+    start = time.perf_counter()
+    preds = predict_batch(batch)
+    return preds, time.perf_counter() - start
+
+def _predict_local(generation: _Generation, batch: np.ndarray) -> Tuple[np.ndarray, float]:
+    from app.utils.ml_pipeline import ModelUnavailableError, normalize_batch
+    # Runs on the generation's single thread, so the lazy load happens once
+    if "loaded" not in generation.local_status:
+        _load_local(generation, warmup=False)
+    if generation.local_model is None:
+        raise ModelUnavailableError("Model is not loaded")
+    start = time.perf_counter()
+    preds = generation.local_model.predict(normalize_batch(batch))
+    return preds, time.perf_counter() - start
+
+def _timed_predict(scheduler: MicroBatcher, stats, frames: np.ndarray) -> np.ndarray:
+    """scheduler.predict that adds the model time of the frames to stats"""
+    preds, seconds = scheduler.submit(frames).result()
+    if stats is not None:
+        stats.predict_seconds += seconds
+        stats.predict_frames += len(frames)
+    return preds
+
+def _new_process_executor(generation: _Generation, start_all: bool):
+    global _status_queue
+    _, intra_op_threads, inter_op_threads = _pool_args
+    # Spawned (not forked) workers never inherit TensorFlow state from the web process
+    context = multiprocessing.get_context("spawn")
+    if _status_queue is None:
+        _status_queue = context.Queue()
+    executor = ProcessPoolExecutor(
+        max_workers=generation.num_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(intra_op_threads, inter_op_threads, config.MODEL_WARMUP, _status_queue,
+                  generation.id, generation.model, generation.niceness)
+    )
+    if start_all:
+        # Workers start lazily; one task per worker spawns them all now
+        for _ in range(generation.num_workers):
+            executor.submit(_ping)
+    return executor
+
+def _dispatch(generation: _Generation, batch: np.ndarray) -> Future:
+    """Send one merged batch to a free worker of the generation"""
+    if generation.executor is not None:
+        executor = generation.executor
+        future = executor.submit(_predict, batch)
+        future.add_done_callback(partial(_check_broken, generation, executor))
+        return future
+    return generation.local_executor.submit(_predict_local, generation, batch)
+
+def _workers_of(generation: _Generation) -> List[dict]:
+    with _lock:
+        return [s for s in _worker_status.values() if s["generation"] == generation.id]
+
+def _forget_workers(generation: _Generation):
+    with _lock:
+        for pid in [pid for pid, status in _worker_status.items() if status["generation"] == generation.id]:
+            del _worker_status[pid]
+
+def _check_broken(generation: _Generation, executor, future: Future):
+    if future.cancelled() or not isinstance(future.exception(), BrokenProcessPool):
+        return
+    with _restart_lock:
+        # Several batches fail together when a worker dies, replace the pool once
+        if generation.executor is not executor or generation.closed:
+            return
+        print("❌ Inference worker died, restarting the pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+        _forget_workers(generation)
+        generation.executor = _new_process_executor(generation, start_all=True)
+
+def _start_generation(spec: ModelVersion, preload: bool, num_workers: Optional[int] = None,
+                      niceness: int = 0) -> _Generation:
+    num_workers = _pool_args[0] if num_workers is None else max(0, num_workers)
+    generation = _Generation(id=next(_generation_ids), model=spec, num_workers=num_workers, niceness=niceness)
+    if num_workers > 0:
+        generation.executor = _new_process_executor(generation, start_all=preload)
+    else:
+        generation.local_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        if preload:
+            generation.local_executor.submit(_load_local, generation, config.MODEL_WARMUP)
+
+    max_batch_size, max_wait_ms = _scheduler_args
+    generation.scheduler = MicroBatcher(
+        partial(_dispatch, generation),
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+        max_in_flight=max(1, num_workers)
+    )
+    with _lock:
+        _generations.append(generation)
+    return generation
+
+def _close_generation(generation: _Generation):
+    generation.closed = True
+    generation.scheduler.close()
+    for executor in (generation.executor, generation.local_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    with _lock:
+        if generation in _generations:
+            _generations.remove(generation)
+    _forget_workers(generation)
+
+def start_pool(
+    num_workers: int = config.INFERENCE_WORKERS,
+    intra_op_threads: int = config.INFERENCE_INTRA_OP_THREADS,
+    inter_op_threads: int = config.INFERENCE_INTER_OP_THREADS,
+    max_batch_size: int = config.INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms: float = config.INFERENCE_MAX_WAIT_MS
+):
+    """Start the inference workers for the active model and the micro-batching scheduler in front of them"""
+    global _current, _decode_executor, _pool_args, _scheduler_args
+    if _current is not None:
+        return
+
+    from app.utils.ml_pipeline import default_model
+    _pool_args = (max(0, num_workers), intra_op_threads, inter_op_threads)
+    _scheduler_args = (max_batch_size, max_wait_ms)
+    _current = _start_generation(default_model(), config.MODEL_PRELOAD)
+    if num_workers > 0:
+        print(f"✅ Started {num_workers} inference workers "
+              f"({intra_op_threads} intra-op / {inter_op_threads} inter-op threads each)")
+
+    _decode_executor = ThreadPoolExecutor(
+        max_workers=max(1, config.ANALYSIS_WORKERS),
+        thread_name_prefix="decode"
+    )
+
+def start_shadow(spec: ModelVersion, num_workers: int = config.SHADOW_WORKERS,
+                 niceness: int = config.SHADOW_NICENESS):
+    """Serve a candidate model next to the current one, for submit(..., shadow=True)"""
+    global _shadow, _shadow_decode_executor
+    if _current is None:
+        raise RuntimeError("Inference pool is not running")
+    if _shadow is not None:
+        return
+    _shadow = _start_generation(spec, config.MODEL_PRELOAD, num_workers, niceness)
+    # One decode thread, so shadow analyses never take more than one core from uploads
+    _shadow_decode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-decode")
+    where = f"{num_workers} worker processes (niceness +{niceness})" if num_workers > 0 else "a local thread"
+    print(f"✅ Shadow model {spec.version} started on {where}")
+
+def stop_pool():
+    """Shut the schedulers and inference workers of every generation down"""
+    global _current, _shadow, _decode_executor, _shadow_decode_executor
+    for generation in list(_generations):
+        _close_generation(generation)
+    _current = None
+    _shadow = None
+    for executor in (_decode_executor, _shadow_decode_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _decode_executor = None
+    _shadow_decode_executor = None
+    with _lock:
+        _worker_status.clear()
+
+def _acquire(shadow: bool = False) -> _Generation:
+    with _lock:
+        generation = _shadow if shadow else _current
+        if generation is None:
+            raise RuntimeError("Shadow model is not running" if shadow else "Inference pool is not running")
+        generation.in_flight += 1
+        return generation
+
+def _release(generation: _Generation):
+    with _lock:
+        generation.in_flight -= 1
+        drained = generation.retired and generation.in_flight == 0 and not generation.closed
+    if drained:
+        _close_generation(generation)
+        print(f"✅ Model {generation.model.version} retired")
+
+async def submit(file_path: str, policy: Optional[SamplingPolicy] = None, frame_observers: Sequence = (),
+                 timeline=None, stats=None, video_id: Optional[int] = None, shadow: bool = False):
+    """Analyze a video, batching its frames with other jobs; returns (feedback, label, confidence).
+
+    The whole analysis runs on the model that is current when it starts,
+    even if a hot swap happens meanwhile; its version and the model time
+    of the video's frames go to stats. shadow=True runs it on the shadow
+    model instead.
+    """
+    from app.utils.ml_pipeline import analyze_video
+    generation = _acquire(shadow)
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            _shadow_decode_executor if shadow else _decode_executor,
+            partial(analyze_video, file_path, policy, partial(_timed_predict, generation.scheduler, stats),
+                    frame_observers, timeline=timeline, stats=stats, video_id=video_id)
+        )
+        if stats is not None:
+            stats.model_version = generation.model.version
+        return result
+    finally:
+        _release(generation)
+
+def _drain_status_queue():
+    while _status_queue is not None:
+        try:
+            status = _status_queue.get_nowait()
+        except Exception:
+            break
+        with _lock:
+            _worker_status[status["pid"]] = status
+
+def _wait_until_ready(generation: _Generation, timeout: float) -> Optional[str]:
+    """Block until every worker of the generation has loaded and warmed up its model; returns an error or None"""
+    if generation.executor is None:
+        # The single inference thread runs this only after the load and warm-up
+        try:
+            generation.local_executor.submit(_ping).result(timeout)
+        except TimeoutError:
+            return f"The model did not load within {timeout:g}s"
+        status = generation.local_status
+        return None if status.get("loaded") else status.get("error", "The model did not load")
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        _drain_status_queue()
+        workers = _workers_of(generation)
+        failed = [s for s in workers if not s["loaded"]]
+        if failed:
+            return failed[0]["error"]
+        if len(workers) >= generation.num_workers:
+            return None
+        time.sleep(0.2)
+    return f"Workers did not load the model within {timeout:g}s"
+
+def swap_model(spec: ModelVersion, timeout: float = config.MODEL_SWAP_TIMEOUT_SEC) -> bool:
+    """Load spec on new workers, warm it up and switch new analyses to it; blocks until done.
+
+    Analyses already running finish on the previous model, whose workers
+    are shut down afterwards. On failure the previous model keeps serving.
+    """
+    global _current
+    from app.utils import model_registry
+    if _current is None:
+        raise RuntimeError("Inference pool is not running")
+    if not _swap_lock.acquire(blocking=False):
+        raise RuntimeError("A model swap is already in progress")
+
+    start = time.perf_counter()
+    try:
+        _swap_status.update(state="loading", version=spec.version, error=None, seconds=None)
+        print(f"🔄 Loading model {spec.version} for a hot swap")
+        generation = _start_generation(spec, preload=True)
+        error = _wait_until_ready(generation, timeout)
+        if error:
+            _close_generation(generation)
+            _swap_status.update(state="failed", error=error, seconds=round(time.perf_counter() - start, 3))
+            print(f"❌ Model swap to {spec.version} failed: {error}")
+            return False
+
+        with _lock:
+            previous, _current = _current, generation
+            previous.retired = True
+            drained = previous.in_flight == 0
+        model_registry.set_active(spec.version)
+        if drained:
+            _close_generation(previous)
+        _swap_status.update(state="active", seconds=round(time.perf_counter() - start, 3))
+        print(f"✅ Switched to model {spec.version} in {_swap_status['seconds']}s")
+        return True
+    finally:
+        _swap_lock.release()
+
+def swap_status() -> dict:
+    """State of the last hot swap: idle, loading, active or failed"""
+    return dict(_swap_status)
+
+def serving_version() -> Optional[str]:
+    """Model version new analyses run with"""
+    return _current.model.version if _current else None
+
+def shadow_version() -> Optional[str]:
+    """Version of the shadow model, None when shadow evaluation is off"""
+    return _shadow.model.version if _shadow else None
+
+def stats() -> Dict[str, float]:
+    """Scheduler queue depth and batch-fill metrics of the current model"""
+    return _current.scheduler.stats() if _current else {}
+
+def model_status() -> dict:
+    """Model load and warm-up timings for /health"""
+    generation = _current
+    if generation is None or generation.executor is None:
+        if generation is None:
+            from app.utils import ml_pipeline
+            return {"mode": "in_process", **ml_pipeline.model_status}
+        return {"mode": "in_process", "backend": generation.model.backend, "version": generation.model.version,
+                "loaded": False, **generation.local_status}
+
+    _drain_status_queue()
+    workers = _workers_of(generation)
+    with _lock:
+        draining = [g.model.version for g in _generations if g.retired and not g.closed]
+    return {
+        "mode": "process_pool",
+        "version": generation.model.version,
+        "workers_ready": len(workers),
+        "workers_configured": generation.num_workers,
+        "workers": workers,
+        "draining_versions": draining
+    }
+
+def model_loaded() -> bool:
+    """Whether real predictions (not simulated ones) are being served"""
+    status = model_status()
+    if status["mode"] == "in_process":
+        return status["loaded"]
+    return any(worker["loaded"] for worker in status["workers"])
@@ -0,0 +1,264 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+from app import config
+from app.db import get_connection, close_connection
+from app.utils import inference_pool, metrics, ml_pipeline, proxy, result_cache, shadow
+from app.utils.keyframes import KeyFrameExtractor, save_key_frames
+from app.utils.pose import extract_poses, save_landmarks
+from app.utils.sampling import SamplingPolicy, default_policy, resolve_policy
+from app.utils.thumbnails import ThumbnailSampler, save_thumbnails
+from app.utils.timeline import TimelineRecorder, save_timeline
+
+@dataclass
+class AnalysisJob:
+    """A stored upload waiting to be analyzed"""
+    video_id: int
+    user_id: int
+    file_path: str
+    policy: Optional[SamplingPolicy] = None
+    video_sha256: Optional[str] = None
+    model_version: Optional[str] = None
+    proxy_path: Optional[str] = None
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+_executor: Optional[ThreadPoolExecutor] = None
+
+async def start_workers(num_workers: int = config.ANALYSIS_WORKERS):
+    """Start the background workers that drain the analysis queue"""
+    global _queue, _executor
+    if _workers:
+        return
+    num_workers = max(1, num_workers)
+    _queue = asyncio.Queue()
+    _executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="analysis")
+    for _ in range(num_workers):
+        _workers.append(asyncio.create_task(_worker()))
+    print(f"✅ Started {num_workers} analysis workers")
+
+    # Uploads left pending by a previous run are picked up again
+    for job in await asyncio.get_running_loop().run_in_executor(_executor, _load_pending_jobs):
+        await _queue.put(job)
+
+async def stop_workers():
+    """Cancel the workers; unfinished jobs stay 'pending' and are requeued on next start"""
+    global _queue, _executor
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    if _executor:
+        _executor.shutdown(wait=False)
+    _queue = None
+    _executor = None
+
+async def enqueue(job: AnalysisJob):
+    """Queue a stored upload for analysis"""
+    if _queue is None:
+        raise RuntimeError("Analysis workers are not running")
+    await _queue.put(job)
+
+def queue_size() -> int:
+    """Number of jobs waiting for a worker"""
+    return _queue.qsize() if _queue else 0
+
+async def _worker():
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await _queue.get()
+        try:
+            await process_job(job, loop)
+        except Exception as e:
+            print(f"❌ Analysis job for video {job.video_id} crashed: {e}")
+        finally:
+            _queue.task_done()
+
+async def process_job(job: AnalysisJob, loop: asyncio.AbstractEventLoop):
+    """Analyze one upload on the inference workers and store the outcome"""
+    observers = []
+    key_frame_extractor = KeyFrameExtractor() if config.KEYFRAMES_ENABLED else None
+    if key_frame_extractor:
+        observers.append(key_frame_extractor)
+    thumbnail_sampler = ThumbnailSampler() if config.THUMBNAILS_ENABLED else None
+    if thumbnail_sampler:
+        observers.append(thumbnail_sampler)
+    timeline = TimelineRecorder() if config.TIMELINE_ENABLED else None
+    stats = ml_pipeline.AnalysisStats()
+
+    # Ingest: the proxy is made once and read by this and every later analysis
+    source, job.proxy_path = await loop.run_in_executor(
+        _executor, proxy.analysis_source, job.video_id, job.file_path, job.proxy_path,
+        job.policy or default_policy()
+    )
+
+    start = time.perf_counter()
+    try:
+        with metrics.timer("analysis"):
+            feedback, predicted_class, confidence = await inference_pool.submit(
+                source, job.policy, observers, timeline, stats, job.video_id
+            )
+    except Exception as e:
+        feedback, predicted_class, confidence = f"Error analyzing video: {str(e)}", "failed", 0.0
+    seconds = time.perf_counter() - start
+    # A hot swap after the upload was queued means another model produced the result
+    if stats.model_version:
+        job.model_version = stats.model_version
+
+    if predicted_class == "failed":
+        metrics.failures_total.inc("analysis")
+    else:
+        metrics.labels_total.inc(predicted_class)
+
+    if stats.stopped_early:
+        print(f"✅ Video {job.video_id} converged early after {stats.frames_analyzed} frames")
+
+    # DB writes block, so they run off the event loop
+    try:
+        await loop.run_in_executor(
+            _executor, store_result, job, feedback, predicted_class, confidence, stats.frames_analyzed
+        )
+    except Exception:
+        metrics.failures_total.inc("store_result")
+        raise
+
+    if timeline and predicted_class != "failed":
+        await loop.run_in_executor(_executor, store_timeline, job, timeline)
+
+    if key_frame_extractor and predicted_class != "failed":
+        await loop.run_in_executor(_executor, store_key_frames, job, key_frame_extractor)
+
+    if thumbnail_sampler and predicted_class != "failed":
+        await loop.run_in_executor(_executor, store_thumbnails, job, thumbnail_sampler)
+
+    # Cached last, so a hit finds this video's thumbnails and timeline already stored
+    await loop.run_in_executor(_executor, cache_result, job, feedback, predicted_class, confidence)
+
+    # Only once the user's result is stored, and never against a simulated one
+    if shadow.enabled() and predicted_class != "failed" and inference_pool.model_loaded():
+        shadow.offer(shadow.ShadowJob(
+            video_id=job.video_id, source=source, policy=job.policy, production_version=job.model_version,
+            production_label=predicted_class, production_confidence=confidence, production_seconds=seconds,
+            production_frame_seconds=stats.predict_seconds_per_frame()
+        ))
+
+def store_timeline(job: AnalysisJob, timeline: TimelineRecorder):
+    """Segment the per-frame predictions and store them; simulated results have none"""
+    with metrics.timer("segment_timeline"):
+        segments = timeline.segments()
+    if not segments:
+        return
+    try:
+        save_timeline(job.video_id, segments)
+    except Exception as e:
+        metrics.failures_total.inc("timeline")
+        print(f"❌ Could not save timeline for video {job.video_id}: {e}")
+
+def store_thumbnails(job: AnalysisJob, sampler: ThumbnailSampler):
+    """Save the thumbnail and sprite sheet; failures do not fail the job"""
+    try:
+        with metrics.timer("thumbnails"):
+            save_thumbnails(job.video_id, sampler)
+    except Exception as e:
+        metrics.failures_total.inc("thumbnails")
+        print(f"❌ Could not save thumbnails for video {job.video_id}: {e}")
+
+def store_key_frames(job: AnalysisJob, extractor: KeyFrameExtractor):
+    """Persist the key frames picked during analysis and their poses; failures do not fail the job"""
+    key_frames = extractor.key_frames()
+    try:
+        with metrics.timer("save_key_frames"):
+            frame_ids = save_key_frames(job.video_id, key_frames)
+    except Exception as e:
+        metrics.failures_total.inc("key_frames")
+        print(f"❌ Could not save key frames for video {job.video_id}: {e}")
+        return
+
+    if not config.POSE_ENABLED:
+        return
+    try:
+        with metrics.timer("key_frame_poses"):
+            poses = extract_poses([kf.image for kf in key_frames])
+        save_landmarks(frame_ids, poses)
+    except Exception as e:
+        metrics.failures_total.inc("pose")
+        print(f"❌ Could not extract poses for video {job.video_id}: {e}")
+
+def store_result(job: AnalysisJob, feedback: str, predicted_class: str, confidence: float,
+                 frames_analyzed: Optional[int] = None):
+    """Write an analysis outcome to the job's videos row and feedback_reports"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        if predicted_class == "failed":
+            cursor.execute(
+                "UPDATE videos SET processing_status = %s WHERE video_id = %s",
+                ("failed", job.video_id)
+            )
+            print(f"❌ Analysis failed for video {job.video_id}: {feedback}")
+        else:
+            # Simulated results (no model loaded) are not attributed to a model
+            model_version = job.model_version if inference_pool.model_loaded() else None
+            cursor.execute(
+                """UPDATE videos
+                   SET class_label = %s, confidence = %s, frames_analyzed = %s, model_version = %s,
+                       processing_status = %s
+                   WHERE video_id = %s""",
+                (predicted_class, confidence, frames_analyzed, model_version, "processed", job.video_id)
+            )
+            cursor.execute(
+                """INSERT INTO feedback_reports
+                   (video_id, user_id, feedback_text)
+                   VALUES (%s, %s, %s)""",
+                (job.video_id, job.user_id, feedback)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+def cache_result(job: AnalysisJob, feedback: str, predicted_class: str, confidence: float):
+    """Offer a stored result to the analysis cache, with the video it was computed on"""
+    # Simulated results (no model loaded) must never be served from the cache
+    if (config.ANALYSIS_CACHE_ENABLED and predicted_class != "failed" and job.video_sha256
+            and job.model_version and inference_pool.model_loaded()):
+        result_cache.store(
+            job.video_sha256, job.model_version, ml_pipeline.analysis_key(job.policy or default_policy()),
+            feedback, predicted_class, confidence, job.video_id
+        )
+
+def _load_pending_jobs() -> List[AnalysisJob]:
+    conn = get_connection()
+    if not conn:
+        return []
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute(
+            """SELECT video_id, user_id, file_path, video_sha256, proxy_path,
+                      sample_fps, max_frames, sampling_mode FROM videos
+               WHERE processing_status = 'pending'
+               ORDER BY upload_time"""
+        )
+        model_version = ml_pipeline.model_version()
+        return [
+            AnalysisJob(row["video_id"], row["user_id"], row["file_path"],
+                        resolve_policy(row["sample_fps"], row["max_frames"], row["sampling_mode"]),
+                        video_sha256=row["video_sha256"], model_version=model_version,
+                        proxy_path=row["proxy_path"])
+            for row in cursor.fetchall()
+        ]
+    except Exception as e:
+        print(f"❌ Could not load pending analysis jobs: {e}")
+        return []
+    finally:
+        close_connection(conn, cursor)
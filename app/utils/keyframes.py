@@ -0,0 +1,136 @@
+import glob
+import os
+import cv2
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional
+from app import config
+from app.db import get_connection, close_connection
+
+# Frames are scored on a small grayscale copy, cheap enough to do for every sampled frame
+SCORE_SIZE = (160, 90)
+# Kept frames are stored at most this wide/tall for the JPEG and later stages
+KEY_FRAME_MAX_SIDE = 640
+
+@dataclass
+class KeyFrame:
+    frame_index: int
+    timestamp_sec: float
+    score: float
+    dhash: int
+    image: np.ndarray  # BGR, downscaled to KEY_FRAME_MAX_SIDE
+
+def dhash(gray: np.ndarray, hash_size: int = 8) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a 9x8 thumbnail"""
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def downscale(frame: np.ndarray, max_side: int) -> np.ndarray:
+    """Shrink a frame so its longer side is at most max_side (copy, never upscaled)"""
+    height, width = frame.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return frame.copy()
+    return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+class KeyFrameExtractor:
+    """Picks representative frames from the sampled frame stream of one video.
+
+    Each frame is scored by scene change (grayscale histogram distance to
+    the previous frame) plus motion (mean absolute pixel difference).
+    Near-duplicates, by dHash Hamming distance, keep only the higher
+    scoring frame, and at most max_frames survive, so memory stays
+    bounded by max_frames downscaled images.
+    """
+
+    def __init__(
+        self,
+        max_frames: int = config.KEYFRAMES_MAX,
+        hamming_threshold: int = config.KEYFRAMES_HAMMING_THRESHOLD
+    ):
+        self.max_frames = max_frames
+        self.hamming_threshold = hamming_threshold
+        self._frames: List[KeyFrame] = []
+        self._prev_gray: Optional[np.ndarray] = None
+        self._prev_hist: Optional[np.ndarray] = None
+
+    def __call__(self, frame_index: int, timestamp_sec: float, frame: np.ndarray):
+        """Frame observer hook for ml_pipeline.analyze_video"""
+        gray = cv2.cvtColor(cv2.resize(frame, SCORE_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        hist = cv2.calcHist([gray], [0], None, [32], [0, 256])
+        cv2.normalize(hist, hist)
+
+        if self._prev_gray is None:
+            # The opening frame always qualifies as a scene start
+            score = 1.0
+        else:
+            scene_change = cv2.compareHist(self._prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA)
+            motion = float(np.mean(cv2.absdiff(gray, self._prev_gray))) / 255.0
+            score = scene_change + motion
+        self._prev_gray = gray
+        self._prev_hist = hist
+
+        frame_hash = dhash(gray)
+        for i, kept in enumerate(self._frames):
+            if hamming(kept.dhash, frame_hash) <= self.hamming_threshold:
+                if score > kept.score:
+                    self._frames[i] = KeyFrame(frame_index, timestamp_sec, score, frame_hash,
+                                               downscale(frame, KEY_FRAME_MAX_SIDE))
+                return
+
+        if len(self._frames) >= self.max_frames:
+            weakest = min(range(len(self._frames)), key=lambda i: self._frames[i].score)
+            if self._frames[weakest].score >= score:
+                return
+            del self._frames[weakest]
+
+        self._frames.append(KeyFrame(frame_index, timestamp_sec, score, frame_hash,
+                                     downscale(frame, KEY_FRAME_MAX_SIDE)))
+
+    def key_frames(self) -> List[KeyFrame]:
+        """Selected frames in playback order"""
+        return sorted(self._frames, key=lambda kf: kf.frame_index)
+
+def save_key_frames(video_id: int, key_frames: List[KeyFrame],
+                    save_images: bool = config.KEYFRAMES_SAVE_IMAGES) -> List[int]:
+    """Replace the video's key_frames rows (and JPEGs); returns the new frame_ids in playback order"""
+    image_paths = [None] * len(key_frames)
+    if save_images and key_frames:
+        image_dir = os.path.join(config.KEYFRAMES_DIR, str(video_id))
+        os.makedirs(image_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(image_dir, "*.jpg")):
+            os.remove(stale)
+        for i, kf in enumerate(key_frames):
+            image_paths[i] = os.path.join(image_dir, f"{kf.frame_index:06d}.jpg")
+            cv2.imwrite(image_paths[i], kf.image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        # Reanalysis replaces the previous selection
+        cursor.execute("DELETE FROM key_frames WHERE video_id = %s", (video_id,))
+        cursor.executemany(
+            """INSERT INTO key_frames (video_id, timestamp_sec, frame_image_path)
+               VALUES (%s, %s, %s)""",
+            [(video_id, int(kf.timestamp_sec), path) for kf, path in zip(key_frames, image_paths)]
+        )
+        cursor.execute(
+            "SELECT frame_id FROM key_frames WHERE video_id = %s ORDER BY frame_id",
+            (video_id,)
+        )
+        frame_ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+        return frame_ids
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
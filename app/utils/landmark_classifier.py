@@ -0,0 +1,199 @@
+import os
+import numpy as np
+from typing import List, Optional, Tuple
+from app import config
+from app.utils.keyframes import downscale
+from app.utils.ml_pipeline import class_labels, generate_feedback
+from app.utils.pose import extract_pose
+
+# MediaPipe Pose landmark indices
+L_SHOULDER, R_SHOULDER = 11, 12
+L_ELBOW, R_ELBOW = 13, 14
+L_WRIST, R_WRIST = 15, 16
+L_HIP, R_HIP = 23, 24
+L_KNEE, R_KNEE = 25, 26
+L_ANKLE, R_ANKLE = 27, 28
+
+# (a, joint, c) triples; the angle is measured at the middle landmark
+ANGLE_JOINTS = np.array([
+    (L_HIP, L_KNEE, L_ANKLE), (R_HIP, R_KNEE, R_ANKLE),              # knees
+    (L_SHOULDER, L_HIP, L_KNEE), (R_SHOULDER, R_HIP, R_KNEE),        # hips
+    (L_SHOULDER, L_ELBOW, L_WRIST), (R_SHOULDER, R_ELBOW, R_WRIST),  # elbows
+    (L_HIP, L_SHOULDER, L_ELBOW), (R_HIP, R_SHOULDER, R_ELBOW),      # shoulders
+])
+KNEES, HIPS, ELBOWS, SHOULDERS = slice(0, 2), slice(2, 4), slice(4, 6), slice(6, 8)
+SPEED_JOINTS = [L_WRIST, R_WRIST, L_KNEE, R_KNEE, L_ANKLE, R_ANKLE]
+
+def normalize_coordinates(coords: np.ndarray) -> np.ndarray:
+    """Center (T, 33, 3) landmarks on the hip midpoint and scale by torso length"""
+    hip_mid = coords[:, [L_HIP, R_HIP], :2].mean(axis=1)
+    shoulder_mid = coords[:, [L_SHOULDER, R_SHOULDER], :2].mean(axis=1)
+    torso = np.linalg.norm(shoulder_mid - hip_mid, axis=1)
+    torso = np.maximum(torso, 1e-6)
+    normalized = coords.copy()
+    normalized[:, :, :2] = (coords[:, :, :2] - hip_mid[:, None, :]) / torso[:, None, None]
+    normalized[:, :, 2] = coords[:, :, 2] / torso[:, None]
+    return normalized
+
+def joint_angles(coords: np.ndarray) -> np.ndarray:
+    """(T, 8) joint angles in degrees from (T, 33, 3) landmarks, all frames at once"""
+    a = coords[:, ANGLE_JOINTS[:, 0], :2]
+    b = coords[:, ANGLE_JOINTS[:, 1], :2]
+    c = coords[:, ANGLE_JOINTS[:, 2], :2]
+    ba, bc = a - b, c - b
+    cosine = np.sum(ba * bc, axis=-1) / np.maximum(
+        np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1), 1e-6
+    )
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+def torso_lean(coords: np.ndarray) -> np.ndarray:
+    """(T,) angle in degrees between the hip-to-shoulder line and vertical"""
+    hip_mid = coords[:, [L_HIP, R_HIP], :2].mean(axis=1)
+    shoulder_mid = coords[:, [L_SHOULDER, R_SHOULDER], :2].mean(axis=1)
+    dx, dy = (shoulder_mid - hip_mid).T
+    return np.degrees(np.arctan2(np.abs(dx), np.maximum(-dy, 1e-6)))
+
+def window_features(coords: np.ndarray, fps: float) -> np.ndarray:
+    """Feature vector for one window of (T, 33, 3) landmarks.
+
+    Per joint angle: min, max, mean and range; torso lean mean and max;
+    mean speed (torso lengths per second) of wrists, knees and ankles.
+    """
+    normalized = normalize_coordinates(coords)
+    angles = joint_angles(normalized)
+    lean = torso_lean(normalized)
+    if len(normalized) > 1:
+        velocity = np.diff(normalized[:, SPEED_JOINTS, :2], axis=0) * fps
+        speeds = np.linalg.norm(velocity, axis=-1).mean(axis=0)
+    else:
+        speeds = np.zeros(len(SPEED_JOINTS))
+    return np.concatenate([
+        angles.min(axis=0), angles.max(axis=0), angles.mean(axis=0), np.ptp(angles, axis=0),
+        [lean.mean(), lean.max()],
+        speeds,
+    ])
+
+# Offsets into window_features()
+_MIN, _MAX, _RANGE = 0, 8, 24
+_LEAN_MAX = 33
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _softmax(x):
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+def rule_probabilities(features: np.ndarray) -> np.ndarray:
+    """Class probabilities (class_labels order) from coaching rules on the window features"""
+    knee_range = features[_RANGE + KNEES.start:_RANGE + KNEES.stop]
+    shoulder_range = features[_RANGE + SHOULDERS.start:_RANGE + SHOULDERS.stop]
+
+    # Which exercise: both knees bend (squat), one knee moves (extension), arms move (raise)
+    exercise_scores = np.array([
+        knee_range.min() / 45.0,
+        shoulder_range.max() / 60.0,
+        (knee_range.max() - knee_range.min()) / 45.0,
+    ])
+    exercise = _softmax(exercise_scores * 3.0)
+
+    min_knee = features[_MIN + KNEES.start:_MIN + KNEES.stop].min()
+    max_lean = features[_LEAN_MAX]
+    max_shoulder = features[_MAX + SHOULDERS.start:_MAX + SHOULDERS.stop].max()
+    min_elbow = features[_MIN + ELBOWS.start:_MIN + ELBOWS.stop].min()
+    moving_knee = int(np.argmax(knee_range))
+    max_moving_knee = features[_MAX + KNEES.start + moving_knee]
+
+    # Correct form: squat depth with an upright back, arms overhead and straight,
+    # extended leg close to straight. Margins in degrees, soft over ~10 degrees.
+    correct = np.array([
+        _sigmoid((110.0 - min_knee) / 10.0) * _sigmoid((45.0 - max_lean) / 10.0),
+        _sigmoid((max_shoulder - 150.0) / 10.0) * _sigmoid((min_elbow - 140.0) / 10.0),
+        _sigmoid((max_moving_knee - 160.0) / 10.0),
+    ])
+
+    probs = np.empty(len(class_labels))
+    probs[0::2] = exercise * correct
+    probs[1::2] = exercise * (1.0 - correct)
+    return probs
+
+class LandmarkClassifier:
+    """Classifies windows of pose landmarks into the six posture labels.
+
+    Uses a small softmax-regression model when weights are available
+    (an .npz with W and b trained on window_features), otherwise the
+    rule engine above.
+    """
+
+    def __init__(self, weights_path: Optional[str] = config.LANDMARK_MODEL_PATH):
+        self.weights = None
+        if weights_path and os.path.exists(weights_path):
+            data = np.load(weights_path)
+            self.weights = (data["W"], data["b"])
+
+    def predict_window(self, features: np.ndarray) -> np.ndarray:
+        if self.weights is not None:
+            W, b = self.weights
+            return _softmax(features @ W + b)
+        return rule_probabilities(features)
+
+class PoseCollector:
+    """Frame observer that runs MediaPipe Pose on every sampled frame"""
+
+    def __init__(self, max_side: int = 640):
+        self.max_side = max_side
+        self.timestamps: List[float] = []
+        self.coordinates: List[np.ndarray] = []
+
+    def __call__(self, frame_index: int, timestamp_sec: float, frame: np.ndarray):
+        pose = extract_pose(downscale(frame, self.max_side))
+        if pose is not None and pose.confidence >= config.POSE_MIN_CONFIDENCE:
+            self.timestamps.append(timestamp_sec)
+            self.coordinates.append(pose.coordinates)
+
+def window_predictions(timestamps: List[float], coordinates: List[np.ndarray],
+                       classifier: Optional[LandmarkClassifier] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Class probabilities of each half-overlapping window; returns (window center times, (N, 6) probs)"""
+    if not coordinates:
+        return np.empty(0), np.empty((0, len(class_labels)))
+    classifier = classifier or LandmarkClassifier()
+    coords = np.stack(coordinates)
+    times = np.asarray(timestamps)
+
+    span = times[-1] - times[0]
+    fps = (len(times) - 1) / span if span > 0 else 1.0
+    window = max(2, int(round(config.LANDMARK_WINDOW_SEC * fps)))
+    step = max(1, window // 2)
+
+    starts = range(0, max(1, len(coords) - window + 1), step)
+    probs = np.array([
+        classifier.predict_window(window_features(coords[start:start + window], fps))
+        for start in starts
+    ])
+    centers = np.array([times[start:start + window].mean() for start in starts])
+    return centers, probs
+
+def classify_landmarks(timestamps: List[float], coordinates: List[np.ndarray],
+                       classifier: Optional[LandmarkClassifier] = None) -> Optional[Tuple[str, float, np.ndarray]]:
+    """Average window predictions over a video; returns (label, confidence, probs) or None without poses"""
+    _, window_probs = window_predictions(timestamps, coordinates, classifier)
+    if len(window_probs) == 0:
+        return None
+    probs = window_probs.mean(axis=0)
+    idx = int(np.argmax(probs))
+    return class_labels[idx], float(probs[idx]), probs
+
+def analyze_landmarks(collector: PoseCollector, timeline=None):
+    """(feedback, label, confidence) from the poses a PoseCollector gathered, or None.
+
+    A TimelineRecorder passed as timeline receives the per-window probabilities.
+    """
+    times, window_probs = window_predictions(collector.timestamps, collector.coordinates)
+    if len(window_probs) == 0:
+        return None
+    if timeline is not None:
+        timeline.record(times, window_probs)
+    probs = window_probs.mean(axis=0)
+    idx = int(np.argmax(probs))
+    label, confidence = class_labels[idx], float(probs[idx])
+    return generate_feedback(label, confidence), label, confidence
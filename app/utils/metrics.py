@@ -0,0 +1,122 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Sequence, Tuple
+
+# In-process metrics rendered in the Prometheus text format by GET /metrics.
+# Each API process keeps its own; inference worker processes are not included.
+
+# Seconds, from a single frame resize up to a long video's analysis
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: LabelValues) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value:g}"
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        bucket_labels = (*self.labelnames, "le")
+        for labelvalues, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield f"{self.name}_bucket{_format_labels(bucket_labels, (*labelvalues, le))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labelvalues)} {total:.6f}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labelvalues)} {cumulative}"
+
+stage_seconds = Histogram(
+    "zumba_stage_seconds",
+    "Time spent in each stage of the upload and analysis path",
+    ["stage"]
+)
+db_seconds = Histogram(
+    "zumba_db_seconds",
+    "Time spent in database calls",
+    ["operation", "statement"]
+)
+uploads_total = Counter("zumba_uploads_total", "Video uploads by outcome", ["outcome"])
+labels_total = Counter("zumba_predicted_labels_total", "Analysis results by predicted label", ["label"])
+failures_total = Counter("zumba_failures_total", "Failures by where they happened", ["stage"])
+frame_cache_total = Counter("zumba_frame_cache_total", "Decoded-frame cache lookups by outcome", ["outcome"])
+shadow_total = Counter("zumba_shadow_total", "Shadow-model samples by outcome", ["outcome"])
+
+REGISTRY = [stage_seconds, db_seconds, uploads_total, labels_total, failures_total, frame_cache_total, shadow_total]
+
+def timer(stage: str):
+    """Context manager recording a stage duration in zumba_stage_seconds"""
+    return stage_seconds.time(stage)
+
+def timed_iter(iterable: Iterable, stage: str) -> Iterator:
+    """Yield from iterable, recording how long each item took to produce"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        stage_seconds.observe(time.perf_counter() - start, stage)
+        yield item
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
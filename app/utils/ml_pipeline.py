@@ -1,26 +1,110 @@
 import cv2
+import hashlib
 import numpy as np
-import tensorflow as tf
 import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+from app import config
+from app.utils import frame_cache, metrics, model_registry, proxy
+from app.utils.backends import DEFAULT_MODEL_PATHS, InferenceBackend, load_backend
+from app.utils.model_registry import ModelVersion
+from app.utils.pipeline import pipeline
+from app.utils.sampling import SamplingPolicy, default_policy, iter_sampled_frames
 
-MODEL_PATH = "app/models/zumba_model.h5"
+# Artifact for the configured backend (zumba_model.h5 for Keras), served
+# when the model registry has no active version
+MODEL_PATH = config.MODEL_PATH or DEFAULT_MODEL_PATHS.get(config.INFERENCE_BACKEND, "app/models/zumba_model.h5")
+INPUT_SIZE = (224, 224)
 
-# Load the model
+# Frames are decoded and predicted in batches of this size so memory use
+# stays bounded no matter how long the uploaded video is
+BATCH_SIZE = 32
+
+# The model is loaded on first use (or by the startup hook), never at import,
+# so processes that only serve auth or admin requests skip TensorFlow entirely
 model = None
-def load_model():
-    global model
-    try:
-        model = tf.keras.models.load_model(MODEL_PATH)
-        print("✅ Model loaded successfully")
-        return True
-    except Exception as e:
-        print(f"❌ Error loading model: {e}")
-        print("⚠️  Video analysis will be simulated")
-        model = None
-        return False
+_model_lock = threading.Lock()
+_load_attempted = False
+model_status = {
+    "backend": config.INFERENCE_BACKEND,
+    "version": None,
+    "loaded": False,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "error": None
+}
+
+def open_model(spec: ModelVersion, num_threads: int = config.INFERENCE_INTRA_OP_THREADS) -> InferenceBackend:
+    """Load a model version's artifact with its backend"""
+    return load_backend(spec.backend, spec.artifact_path, num_threads)
+
+def load_model(spec: Optional[ModelVersion] = None, num_threads: int = config.INFERENCE_INTRA_OP_THREADS):
+    """Load spec (by default the active version) as this process's model"""
+    global model, _load_attempted
+    spec = spec or default_model()
+    with _model_lock:
+        _load_attempted = True
+        start = time.perf_counter()
+        model_status.update(backend=spec.backend, version=spec.version)
+        try:
+            model = open_model(spec, num_threads)
+            model_status.update(loaded=True, error=None)
+            print(f"✅ Model {spec.version} loaded successfully ({spec.backend} backend)")
+            return True
+        except Exception as e:
+            print(f"❌ Error loading model: {e}")
+            print("⚠️  Video analysis will be simulated")
+            model = None
+            model_status.update(loaded=False, error=str(e))
+            return False
+        finally:
+            model_status["load_seconds"] = round(time.perf_counter() - start, 3)
+
+_model_version = None
+
+def _configured_version() -> Optional[str]:
+    """Version label of MODEL_PATH (None when it does not exist)"""
+    global _model_version
+    if _model_version is None:
+        if config.MODEL_VERSION:
+            _model_version = config.MODEL_VERSION
+        elif os.path.exists(MODEL_PATH):
+            digest = hashlib.sha256()
+            with open(MODEL_PATH, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            _model_version = f"{config.INFERENCE_BACKEND}-{digest.hexdigest()[:12]}"
+    return _model_version
 
-# Try to load model but don't block startup
-load_model()
+def default_model() -> ModelVersion:
+    """The registry's active version, or the configured MODEL_PATH when there is none"""
+    return model_registry.active_version() or ModelVersion(
+        version=_configured_version(),
+        backend=config.INFERENCE_BACKEND,
+        artifact_path=MODEL_PATH
+    )
+
+def model_version() -> Optional[str]:
+    """Version new analyses run with (None when no model artifact exists)"""
+    return default_model().version
+
+def get_model():
+    """Return the model, loading it on first use (None if it cannot be loaded)"""
+    if not _load_attempted:
+        load_model()
+    return model
+
+def warm_up(batch_size: int = BATCH_SIZE) -> bool:
+    """Run a dummy batch so the first real upload does not pay for graph tracing"""
+    if get_model() is None:
+        return False
+    start = time.perf_counter()
+    predict_batch(np.zeros((batch_size, *INPUT_SIZE, 3), dtype=np.uint8))
+    model_status["warmup_seconds"] = round(time.perf_counter() - start, 3)
+    print(f"✅ Model warmed up in {model_status['warmup_seconds']}s")
+    return True
 
 class_labels = [
     "Squat_Correct", "Squat_Incorrect",
@@ -28,41 +112,266 @@ class_labels = [
     "Knee_Extension_Correct", "Knee_Extension_Incorrect"
 ]
 
-def analyze_video(file_path: str):
-    """Analyze video using the trained model"""
-    if model is None:
-        # Simulate analysis for testing
-        import random
-        simulated_labels = ["Squat_Correct", "Squat_Incorrect", "Arm_Raise_Correct", "Arm_Raise_Incorrect"]
-        label = random.choice(simulated_labels)
-        confidence = random.uniform(0.7, 0.95)
-        feedback = generate_feedback(label, confidence)
-        return feedback, label, confidence
+class ModelUnavailableError(RuntimeError):
+    """Raised when predictions are requested but no model is loaded"""
+
+# Per-thread float32 input buffer, grown to the largest batch seen and reused
+_float_buffers = threading.local()
+
+def normalize_batch(batch: np.ndarray) -> np.ndarray:
+    """Scale a uint8 batch to float32 in [0, 1] in one pass, into this thread's reusable buffer.
+
+    The result is only valid until the thread's next call.
+    """
+    buffer = getattr(_float_buffers, "buffer", None)
+    if buffer is None or len(buffer) < len(batch) or buffer.shape[1:] != batch.shape[1:]:
+        buffer = np.empty(batch.shape, dtype=np.float32)
+        _float_buffers.buffer = buffer
+    out = buffer[:len(batch)]
+    np.multiply(batch, np.float32(1.0 / 255.0), out=out)
+    return out
+
+def predict_batch(batch: np.ndarray) -> np.ndarray:
+    """Run the model on a uint8 batch of preprocessed frames"""
+    current = get_model()
+    if current is None:
+        raise ModelUnavailableError("Model is not loaded")
+    return current.predict(normalize_batch(batch))
+
+def simulate_analysis():
+    """Random result used when no model is available (for testing)"""
+    import random
+    simulated_labels = ["Squat_Correct", "Squat_Incorrect", "Arm_Raise_Correct", "Arm_Raise_Incorrect"]
+    label = random.choice(simulated_labels)
+    confidence = random.uniform(0.7, 0.95)
+    feedback = generate_feedback(label, confidence)
+    return feedback, label, confidence
+
+# Called with (frame_index, timestamp_sec, frame) for every sampled full-size BGR frame
+FrameObserver = Callable[[int, float, np.ndarray], None]
+
+ANALYSIS_MODES = ("cnn", "landmark", "cascade")
+
+def analysis_key(policy: SamplingPolicy, mode: Optional[str] = None) -> str:
+    """Sampling policy, analysis mode, early exit and proxy, everything besides the model that shapes a result"""
+    key = f"{policy.key()}:{mode or config.ANALYSIS_MODE}"
+    if config.PROXY_ENABLED and proxy.covers(policy):
+        key += f":proxy-{proxy.settings_key()}"
+    if config.EARLY_EXIT_ENABLED:
+        key += (f":early-{config.EARLY_EXIT_MIN_FRAMES}-{config.EARLY_EXIT_MARGIN:g}"
+                f"-{config.EARLY_EXIT_STABLE_BATCHES}")
+    return key
+
+@dataclass
+class AnalysisStats:
+    """Filled in by analyze_video for the caller"""
+    frames_analyzed: int = 0
+    stopped_early: bool = False
+    frame_cache_hit: bool = False
+    model_version: Optional[str] = None  # Set by inference_pool.submit
+    # Model time spent on this video's frames, measured inside the inference call
+    # (no queueing, decoding or batching wait), set by inference_pool.submit
+    predict_seconds: float = 0.0
+    predict_frames: int = 0
+
+    def predict_seconds_per_frame(self) -> Optional[float]:
+        return self.predict_seconds / self.predict_frames if self.predict_frames else None
+
+class ConvergenceMonitor:
+    """Decides when the running class estimate of a video has settled.
+
+    After each batch the running mean probabilities are checked: the top
+    class must lead the runner-up by min_margin and by Z_SCORE standard
+    errors of that lead, and stay on top for stable_batches batches in a
+    row. The standard error uses sd_top + sd_second, an upper bound that
+    needs no covariance tracking.
+    """
+
+    Z_SCORE = 1.96
+
+    def __init__(
+        self,
+        min_frames: int = config.EARLY_EXIT_MIN_FRAMES,
+        min_margin: float = config.EARLY_EXIT_MARGIN,
+        stable_batches: int = config.EARLY_EXIT_STABLE_BATCHES
+    ):
+        self.min_frames = min_frames
+        self.min_margin = min_margin
+        self.stable_batches = stable_batches
+        self._count = 0
+        self._sum = None
+        self._sq_sum = None
+        self._top = None
+        self._stable = 0
+
+    def update(self, preds: np.ndarray) -> bool:
+        """Add a batch of probabilities; True once it is safe to stop"""
+        preds = np.asarray(preds, dtype=np.float64)
+        if self._sum is None:
+            self._sum = np.zeros(preds.shape[1])
+            self._sq_sum = np.zeros(preds.shape[1])
+        self._sum += preds.sum(axis=0)
+        self._sq_sum += np.square(preds).sum(axis=0)
+        self._count += len(preds)
+
+        mean = self._sum / self._count
+        second, top = np.argsort(mean)[-2:]
+        std = np.sqrt(np.maximum(self._sq_sum / self._count - np.square(mean), 0.0))
+        margin = mean[top] - mean[second]
+        std_error = (std[top] + std[second]) / np.sqrt(self._count)
+        settled = margin >= max(self.min_margin, self.Z_SCORE * std_error)
+
+        self._stable = self._stable + 1 if settled and top == self._top else int(settled)
+        self._top = top
+        return self._count >= self.min_frames and self._stable >= self.stable_batches
+
+def analyze_video(
+    file_path: str,
+    policy: Optional[SamplingPolicy] = None,
+    predict_fn: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    frame_observers: Sequence[FrameObserver] = (),
+    mode: Optional[str] = None,
+    timeline=None,
+    stats: Optional[AnalysisStats] = None,
+    video_id: Optional[int] = None
+):
+    """Analyze video using the trained model.
+
+    Only the frames chosen by the sampling policy are classified; the
+    server-wide default policy is used when none is given. predict_fn
+    maps a uint8 frame batch to class probabilities and defaults to the
+    model loaded in this process. frame_observers see each sampled frame
+    before it is resized, so other stages (key frames, ...) reuse this
+    decode instead of opening the video again.
+
+    mode picks the classifier: "cnn" (the model), "landmark" (pose
+    landmarks only) or "cascade" (landmarks first, the CNN only when the
+    landmark confidence is below ZUMBA_CASCADE_CONFIDENCE_THRESHOLD).
+    A timeline.TimelineRecorder passed as timeline receives the
+    timestamped probabilities of whichever classifier decided, and
+    stats (an AnalysisStats) how many sampled frames it analyzed. With
+    ZUMBA_EARLY_EXIT_ENABLED the CNN stops decoding once its running
+    estimate has converged (see ConvergenceMonitor).
+
+    With ZUMBA_FRAME_CACHE_ENABLED and a video_id, the CNN's resized
+    frames are cached (see frame_cache) and, when no frame observers
+    need the decoded frames, later analyses read them from the cache.
+    """
+    policy = policy or default_policy()
+    mode = mode or config.ANALYSIS_MODE
+    stats = stats if stats is not None else AnalysisStats()
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Analysis mode must be one of {', '.join(ANALYSIS_MODES)}")
     
+    if mode != "cnn":
+        result = _analyze_landmarks(file_path, policy, frame_observers, timeline, stats)
+        if mode == "landmark":
+            return result or ("No person detected in video", "failed", 0.0)
+        if result and result[2] >= config.CASCADE_CONFIDENCE_THRESHOLD:
+            return result
+        # Not confident enough: the CNN decides; observers have already seen every frame
+        frame_observers = ()
+        if timeline is not None:
+            timeline.reset()
+        stats.frames_analyzed = 0
+    
+    return _analyze_cnn(file_path, policy, predict_fn, frame_observers, timeline, stats, video_id)
+
+def _analyze_landmarks(file_path: str, policy: SamplingPolicy, frame_observers: Sequence[FrameObserver],
+                       timeline, stats: AnalysisStats):
+    from app.utils.landmark_classifier import PoseCollector, analyze_landmarks
+    collector = PoseCollector()
     try:
         cap = cv2.VideoCapture(file_path)
-        frames = []
+        try:
+            for frame_index, timestamp, frame in metrics.timed_iter(iter_sampled_frames(cap, policy), "decode"):
+                for observer in frame_observers:
+                    observer(frame_index, timestamp, frame)
+                with metrics.timer("pose"):
+                    collector(frame_index, timestamp, frame)
+                stats.frames_analyzed += 1
+        finally:
+            cap.release()
+        return analyze_landmarks(collector, timeline)
+    except Exception as e:
+        print(f"❌ Error analyzing landmarks: {e}")
+        return None
+
+def _analyze_cnn(
+    file_path: str,
+    policy: SamplingPolicy,
+    predict_fn: Optional[Callable[[np.ndarray], np.ndarray]],
+    frame_observers: Sequence[FrameObserver],
+    timeline=None,
+    stats: Optional[AnalysisStats] = None,
+    video_id: Optional[int] = None
+):
+    if predict_fn is None:
+        if get_model() is None:
+            return simulate_analysis()
+        predict_fn = predict_batch
+    
+    try:
+        cap = None
+        cache_writer = None
+        pred_sum = None
+        frame_count = 0
+        monitor = ConvergenceMonitor() if config.EARLY_EXIT_ENABLED else None
+        stats = stats if stats is not None else AnalysisStats()
+        use_cache = config.FRAME_CACHE_ENABLED and video_id is not None
         
-        # Extract frames from video
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Resize frame to match model input size
-            frame = cv2.resize(frame, (224, 224))
-            frame = frame.astype("float32") / 255.0
-            frames.append(frame)
+        # Observers need decoded frames, so only analyses without them can skip decoding
+        cached = frame_cache.load(video_id, file_path, policy, INPUT_SIZE) if use_cache and not frame_observers else None
+        if use_cache:
+            metrics.frame_cache_total.inc("hit" if cached is not None else "miss")
+        
+        if cached is not None:
+            stats.frame_cache_hit = True
+            timestamps = cached.timestamps
+            batches = cached.batches(BATCH_SIZE)
+        else:
+            cap = cv2.VideoCapture(file_path)
+            # Observers run before a frame joins its batch, so timestamps line up with predictions
+            timestamps = []
+            if timeline is not None or use_cache:
+                frame_observers = (*frame_observers, lambda index, timestamp, frame: timestamps.append(timestamp))
+            if use_cache:
+                cache_writer = frame_cache.open_writer(video_id, file_path, policy, cap, INPUT_SIZE)
+            batches = iter_frame_batches(cap, policy, BATCH_SIZE, frame_observers)
         
-        cap.release()
+        try:
+            # Predict batch by batch and keep a running sum of class probabilities
+            for batch in batches:
+                if cache_writer:
+                    # Batch buffers are reused, so frames are copied into the cache as they pass
+                    with metrics.timer("frame_cache_write"):
+                        cache_writer.write(batch, timestamps[frame_count:frame_count + len(batch)])
+                with metrics.timer("predict"):
+                    preds = predict_fn(batch)
+                if timeline is not None:
+                    timeline.record(timestamps[frame_count:frame_count + len(batch)], preds)
+                batch_sum = np.sum(preds, axis=0, dtype=np.float64)
+                pred_sum = batch_sum if pred_sum is None else pred_sum + batch_sum
+                frame_count += len(batch)
+                stats.frames_analyzed = frame_count
+                if monitor and monitor.update(preds):
+                    stats.stopped_early = True
+                    break
+            # Only complete frame sets are cached
+            if cache_writer and not stats.stopped_early:
+                cache_writer.commit()
+        finally:
+            if cache_writer:
+                cache_writer.discard()
+            if cap is not None:
+                # Stops the decode/preprocess threads before the capture goes away
+                batches.close()
+                cap.release()
         
-        if not frames:
-            return "No frames extracted from video", "failed"
+        if frame_count == 0:
+            return "No frames extracted from video", "failed", 0.0
         
-        # Convert to numpy array and predict
-        video_array = np.array(frames)
-        preds = model.predict(video_array, verbose=0)
-        avg_pred = np.mean(preds, axis=0)
+        avg_pred = pred_sum / frame_count
         idx = int(np.argmax(avg_pred))
         label = class_labels[idx]
         confidence = float(avg_pred[idx])
@@ -72,10 +381,87 @@ def analyze_video(file_path: str):
         
         return feedback, label, confidence
         
+    except ModelUnavailableError:
+        return simulate_analysis()
     except Exception as e:
         print(f"❌ Error analyzing video: {e}")
         return f"Error analyzing video: {str(e)}", "failed", 0.0
 
+class BatchBuffers:
+    """Ring of preallocated uint8 batch buffers that frames are resized into.
+
+    A buffer is handed out again after count more batches, so a consumer
+    must be done with a batch by then (or copy it).
+    """
+
+    def __init__(self, count: int, batch_size: int, size=INPUT_SIZE):
+        self.shape = (batch_size, size[1], size[0], 3)
+        self._buffers = [None] * max(1, count)
+        self._next = 0
+
+    def next(self) -> np.ndarray:
+        i = self._next
+        self._next = (i + 1) % len(self._buffers)
+        if self._buffers[i] is None:
+            self._buffers[i] = np.empty(self.shape, dtype=np.uint8)
+        return self._buffers[i]
+
+def iter_frame_batches(
+    cap,
+    policy: SamplingPolicy,
+    batch_size: int = BATCH_SIZE,
+    frame_observers: Sequence[FrameObserver] = (),
+    pipelined: bool = config.PIPELINE_ENABLED
+):
+    """Yield the sampled frames of an open capture as uint8 batches of at most batch_size.
+
+    Frames stay uint8 until predict time, which keeps batches a quarter of
+    the float32 size when they are handed to another process. When
+    pipelined, decoding and preprocessing (observers, resize, batching)
+    run in their own threads ahead of the caller, which consumes the
+    batches for inference; close the generator before releasing cap.
+
+    Frames are resized straight into reused buffers, so each yielded
+    batch is only valid until the next one is requested. Callers that
+    keep batches must copy them.
+    """
+    def decode():
+        return metrics.timed_iter(iter_sampled_frames(cap, policy), "decode")
+    
+    # One buffer is being filled and one consumed; pipelined, the queue holds more
+    buffers = BatchBuffers(config.PIPELINE_BATCH_QUEUE_SIZE + 2 if pipelined else 1, batch_size)
+    
+    def preprocess(frames):
+        batch = buffers.next()
+        count = 0
+        for frame_index, timestamp, frame in frames:
+            if frame_observers:
+                with metrics.timer("frame_observers"):
+                    for observer in frame_observers:
+                        observer(frame_index, timestamp, frame)
+            
+            # Resize frame to match model input size, straight into the batch
+            with metrics.timer("resize"):
+                cv2.resize(frame, INPUT_SIZE, dst=batch[count])
+            count += 1
+            
+            if count == batch_size:
+                yield batch
+                batch = buffers.next()
+                count = 0
+        
+        if count:
+            yield batch[:count]
+    
+    if not pipelined:
+        yield from preprocess(decode())
+        return
+    
+    yield from pipeline(
+        [(decode, config.PIPELINE_FRAME_QUEUE_SIZE), (preprocess, config.PIPELINE_BATCH_QUEUE_SIZE)],
+        name="analysis"
+    )
+
 def generate_feedback(label: str, confidence: float) -> str:
     """Generate human-readable feedback based on prediction"""
     if "Correct" in label:
@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+from app import config
+from app.utils.backends import BACKENDS
+
+# Versioned model artifacts, one directory per version in MODEL_REGISTRY_DIR:
+#   <version>/model.json   {"version", "backend", "artifact", "created_at", "description"}
+#   <version>/<artifact>   the file for that backend (.h5, .tflite or .onnx)
+# ACTIVE names the version served; the server loads it at startup and a hot
+# swap (POST /admin/models/{version}/activate) rewrites it.
+
+METADATA_FILE = "model.json"
+ACTIVE_FILE = "ACTIVE"
+
+@dataclass
+class ModelVersion:
+    version: Optional[str]  # None for an unversioned artifact that does not exist
+    backend: str
+    artifact_path: str
+    created_at: Optional[str] = None
+    description: Optional[str] = None
+
+_lock = threading.Lock()
+_active: Optional[str] = None
+_active_loaded = False
+
+def _version_dir(version: str) -> str:
+    if not version or os.path.basename(version) != version or version.startswith("."):
+        raise ValueError(f"Invalid model version name: {version!r}")
+    return os.path.join(config.MODEL_REGISTRY_DIR, version)
+
+def get_version(version: str) -> Optional[ModelVersion]:
+    """A registered version, or None"""
+    try:
+        directory = _version_dir(version)
+    except ValueError:
+        return None
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    return ModelVersion(
+        version=metadata["version"],
+        backend=metadata["backend"],
+        artifact_path=os.path.join(directory, metadata["artifact"]),
+        created_at=metadata.get("created_at"),
+        description=metadata.get("description")
+    )
+
+def list_versions() -> List[ModelVersion]:
+    """Registered versions, oldest first"""
+    if not os.path.isdir(config.MODEL_REGISTRY_DIR):
+        return []
+    versions = [get_version(name) for name in os.listdir(config.MODEL_REGISTRY_DIR)]
+    return sorted((v for v in versions if v), key=lambda v: (v.created_at or "", v.version))
+
+def register(artifact: str, version: str, backend: str, description: Optional[str] = None) -> ModelVersion:
+    """Copy an artifact into the registry under a new version"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend must be one of {', '.join(BACKENDS)}")
+    directory = _version_dir(version)
+    if os.path.exists(directory):
+        raise ValueError(f"Model version {version} is already registered")
+
+    os.makedirs(directory)
+    shutil.copy2(artifact, os.path.join(directory, os.path.basename(artifact)))
+    metadata = {
+        "version": version,
+        "backend": backend,
+        "artifact": os.path.basename(artifact),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "description": description,
+    }
+    # model.json last: a version is only listed once its artifact is in place
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return get_version(version)
+
+def active_version() -> Optional[ModelVersion]:
+    """The version named by ACTIVE, or None when the registry is not used"""
+    global _active, _active_loaded
+    with _lock:
+        if not _active_loaded:
+            path = os.path.join(config.MODEL_REGISTRY_DIR, ACTIVE_FILE)
+            if os.path.exists(path):
+                with open(path) as f:
+                    _active = f.read().strip() or None
+            _active_loaded = True
+        active = _active
+    return get_version(active) if active else None
+
+def set_active(version: str):
+    """Make version the one served (and loaded at the next startup)"""
+    global _active, _active_loaded
+    if get_version(version) is None:
+        raise ValueError(f"Unknown model version: {version}")
+    path = os.path.join(config.MODEL_REGISTRY_DIR, ACTIVE_FILE)
+    with _lock:
+        with open(f"{path}.tmp", "w") as f:
+            f.write(version + "\n")
+        os.replace(f"{path}.tmp", path)
+        _active = version
+        _active_loaded = True
@@ -0,0 +1,76 @@
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Sequence, Tuple
+
+# A stage is a generator function: the first takes no arguments and produces
+# items, every later one consumes the previous stage's items and yields its own
+Stage = Tuple[Callable[..., Iterable], int]  # (generator function, output queue size)
+
+_END = object()
+_POLL_SECONDS = 0.1
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+def _put(outbox: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            outbox.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _drain(inbox: queue.Queue, stop: threading.Event) -> Iterator:
+    while True:
+        try:
+            item = inbox.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is _END:
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+def _run_stage(fn, inbox, outbox: queue.Queue, stop: threading.Event):
+    try:
+        items = fn() if inbox is None else fn(_drain(inbox, stop))
+        for item in items:
+            if not _put(outbox, item, stop):
+                return
+        _put(outbox, _END, stop)
+    except BaseException as e:
+        _put(outbox, _Failure(e), stop)
+
+def pipeline(stages: Sequence[Stage], name: str = "pipeline") -> Iterator:
+    """Run generator stages concurrently, each in its own thread, joined by bounded queues.
+
+    Yields the last stage's items to the caller, which acts as the final
+    consumer. A full queue blocks its producer, so memory stays bounded
+    and throughput follows the slowest stage instead of the sum of all.
+    Exceptions raised in any stage are re-raised here. Closing the
+    generator (or breaking out of the loop) stops every stage and waits
+    for its thread, so resources the stages share can be released after.
+    """
+    stop = threading.Event()
+    threads = []
+    inbox = None
+    for i, (fn, maxsize) in enumerate(stages):
+        outbox = queue.Queue(maxsize=max(1, maxsize))
+        threads.append(threading.Thread(
+            target=_run_stage, args=(fn, inbox, outbox, stop), name=f"{name}-{i}", daemon=True
+        ))
+        inbox = outbox
+
+    for thread in threads:
+        thread.start()
+    try:
+        yield from _drain(inbox, stop)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
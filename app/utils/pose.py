@@ -0,0 +1,93 @@
+import json
+import threading
+import cv2
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+from app import config
+from app.db import get_connection, close_connection
+
+NUM_LANDMARKS = 33
+
+@dataclass
+class PoseResult:
+    coordinates: np.ndarray  # (33, 3) normalized x, y and relative z
+    visibility: np.ndarray   # (33,)
+    confidence: float        # Mean landmark visibility, MediaPipe Pose has no overall score
+
+# MediaPipe graphs are not thread-safe and expensive to build, so each
+# worker thread builds one on first use and keeps reusing it
+_local = threading.local()
+
+def get_pose():
+    """This thread's MediaPipe Pose graph"""
+    pose = getattr(_local, "pose", None)
+    if pose is None:
+        import mediapipe as mp
+        pose = mp.solutions.pose.Pose(
+            static_image_mode=True,
+            model_complexity=config.POSE_MODEL_COMPLEXITY,
+            min_detection_confidence=config.POSE_MIN_DETECTION_CONFIDENCE
+        )
+        _local.pose = pose
+    return pose
+
+def extract_pose(image: np.ndarray) -> Optional[PoseResult]:
+    """Run MediaPipe Pose on one BGR image; None when no person is found"""
+    results = get_pose().process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    if not results.pose_landmarks:
+        return None
+
+    points = np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark],
+        dtype=np.float32
+    )
+    return PoseResult(
+        coordinates=points[:, :3],
+        visibility=points[:, 3],
+        confidence=float(points[:, 3].mean())
+    )
+
+def extract_poses(images: Sequence[np.ndarray]) -> List[Optional[PoseResult]]:
+    """Run pose extraction over a video's key frames"""
+    return [extract_pose(image) for image in images]
+
+def save_landmarks(frame_ids: Sequence[int], poses: Sequence[Optional[PoseResult]],
+                   min_confidence: float = config.POSE_MIN_CONFIDENCE) -> int:
+    """Bulk-insert one video's landmarks in a single transaction; returns rows written.
+
+    Frames without a detection or with confidence below min_confidence
+    are dropped here so low-quality poses never reach storage.
+    """
+    rows = [
+        (
+            frame_id,
+            json.dumps(np.round(pose.coordinates.astype(np.float64), 5).tolist()),
+            json.dumps(np.round(pose.visibility.astype(np.float64), 4).tolist()),
+            round(pose.confidence, 4)
+        )
+        for frame_id, pose in zip(frame_ids, poses)
+        if pose is not None and pose.confidence >= min_confidence
+    ]
+    if not rows:
+        return 0
+
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.executemany(
+            """INSERT INTO landmarks (frame_id, coordinates, visibility_scores, confidence_score)
+               VALUES (%s, %s, %s, %s)""",
+            rows
+        )
+        conn.commit()
+        return len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
@@ -0,0 +1,166 @@
+import os
+from typing import Optional, Tuple
+import cv2
+from app import config
+from app.db import get_connection, close_connection
+from app.utils import metrics
+from app.utils.sampling import SamplingPolicy, iter_sampled_frames
+
+# Every upload is transcoded once, at ingest, into a small low-FPS proxy
+# stored next to the original (videos.proxy_path). Reanalysis and previews
+# decode the proxy instead of the full-resolution original.
+
+# (name, fourcc, extension) in order of preference. OpenCV wheels usually
+# lack an H.264 encoder, so VP8 WebM is the common case; both play in
+# browsers. MPEG-4 Part 2 does not, so an mp4v proxy is only analyzed and
+# previews keep serving the original.
+CODECS = (("h264", "avc1", ".mp4"), ("vp8", "VP80", ".webm"), ("mp4v", "mp4v", ".mp4"))
+BROWSER_CODECS = ("h264", "vp8")
+
+def settings_key() -> str:
+    """Proxy size and rate; part of the proxy's file name and of analysis cache keys"""
+    return f"{config.PROXY_SHORT_SIDE}-{config.PROXY_FPS:g}"
+
+def proxy_path(file_path: str, codec: str = CODECS[0][0]) -> str:
+    base, _ = os.path.splitext(file_path)
+    extension = next(ext for name, _, ext in CODECS if name == codec)
+    return f"{base}.proxy-{settings_key()}.{codec}{extension}"
+
+def proxy_codec(path: str) -> Optional[str]:
+    """Codec named in a proxy's file name, None for files not written by create_proxy"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    codec = name.rsplit(".", 1)[-1]
+    return codec if any(codec == c for c, _, _ in CODECS) else None
+
+def is_current(file_path: str, path: Optional[str]) -> bool:
+    """Whether path is a proxy of file_path made with the current settings, in any codec"""
+    return bool(path) and any(path == proxy_path(file_path, codec) for codec, _, _ in CODECS)
+
+def proxy_stride(source_fps: float, fps: float) -> int:
+    """Keep every Nth source frame; rounded down so the proxy is never sparser than fps"""
+    if not fps or source_fps <= 0:
+        return 1
+    return max(1, int(source_fps // fps))
+
+def covers(policy: SamplingPolicy) -> bool:
+    """Whether the proxy holds every frame the policy samples (it is no sparser than target_fps)"""
+    if not config.PROXY_FPS:
+        return True
+    return policy.target_fps is not None and policy.target_fps <= config.PROXY_FPS
+
+def proxy_size(width: int, height: int, short_side: int) -> Tuple[int, int]:
+    """Frame size with the shorter side at short_side (never upscaled), rounded to even for the codec"""
+    scale = short_side / min(width, height)
+    if scale >= 1:
+        return width, height
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+def _temp_path(dest: str) -> str:
+    # Same extension, cv2.VideoWriter picks the container from it
+    base, extension = os.path.splitext(dest)
+    return f"{base}.tmp{extension}"
+
+def _open_writer(file_path: str, fps: float, size: Tuple[int, int]) -> Tuple[cv2.VideoWriter, str]:
+    """A writer for the first codec of CODECS this OpenCV build can encode, and its proxy path"""
+    for codec, fourcc, _ in CODECS:
+        dest = proxy_path(file_path, codec)
+        temp_path = _temp_path(dest)
+        writer = cv2.VideoWriter(temp_path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if writer.isOpened():
+            return writer, dest
+        writer.release()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    raise RuntimeError(f"cv2.VideoWriter cannot encode any of {', '.join(c for c, _, _ in CODECS)}")
+
+def create_proxy(src: str, short_side: int = config.PROXY_SHORT_SIDE,
+                 fps: float = config.PROXY_FPS) -> Optional[str]:
+    """Write a downscaled, low-FPS copy of src next to it; returns its path.
+
+    Returns None without writing anything when src is already no larger
+    and no faster than the proxy would be.
+    """
+    cap = cv2.VideoCapture(src)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {src}")
+
+    temp_path = None
+    try:
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        stride = proxy_stride(source_fps, fps)
+        # iter_sampled_frames turns this rate back into exactly that stride
+        policy = SamplingPolicy(target_fps=source_fps / stride if source_fps > 0 else None, mode="stride")
+        size = proxy_size(width, height, short_side)
+        if size == (width, height) and stride == 1:
+            return None
+
+        # Timestamps line up with the original's, so timelines and key frames stay valid
+        writer, dest = _open_writer(src, (source_fps or 30.0) / stride, size)
+        temp_path = _temp_path(dest)
+        try:
+            for _, _, frame in iter_sampled_frames(cap, policy):
+                writer.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+        finally:
+            writer.release()
+        os.replace(temp_path, dest)
+        return dest
+    except Exception:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        cap.release()
+
+def ensure_proxy(video_id: int, file_path: str, current: Optional[str] = None) -> Optional[str]:
+    """The video's proxy for the current settings, created on first use.
+
+    current is the stored videos.proxy_path. Returns None when proxies are
+    disabled or the original is already small enough to be used directly.
+    """
+    if not config.PROXY_ENABLED:
+        return None
+    if is_current(file_path, current) and os.path.exists(current):
+        return current
+
+    with metrics.timer("proxy"):
+        path = create_proxy(file_path)
+    # A proxy made with other settings is replaced, not kept next to the new one
+    if current and current != path and os.path.exists(current):
+        os.remove(current)
+    save_proxy_path(video_id, path)
+    return path
+
+def analysis_source(video_id: int, file_path: str, current: Optional[str],
+                    policy: SamplingPolicy) -> Tuple[str, Optional[str]]:
+    """(file to analyze, proxy path to remember) for a video; falls back to the original on errors"""
+    try:
+        path = ensure_proxy(video_id, file_path, current)
+    except Exception as e:
+        metrics.failures_total.inc("proxy")
+        print(f"❌ Could not create proxy for video {video_id}, analyzing the original: {e}")
+        return file_path, None
+    return (path if path and covers(policy) else file_path), path
+
+def save_proxy_path(video_id: int, path: Optional[str]):
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("UPDATE videos SET proxy_path = %s WHERE video_id = %s", (path, video_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+def preview_path(file_path: str, stored_proxy: Optional[str]) -> str:
+    """File to serve for previews: the proxy when there is one browsers can play, else the original"""
+    if stored_proxy and proxy_codec(stored_proxy) in BROWSER_CODECS and os.path.exists(stored_proxy):
+        return stored_proxy
+    return file_path
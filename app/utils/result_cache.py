@@ -0,0 +1,113 @@
+import hashlib
+import threading
+from typing import Optional, Tuple
+from app import config
+from app.db import get_connection, close_connection
+
+# Analysis results keyed by (video sha256, model version, sampling policy),
+# stored in the analysis_cache table so they survive restarts. The policy's
+# analysis key grows with every setting that shapes a result, so its hash
+# is stored to fit the fixed-width column.
+_counter_lock = threading.Lock()
+_hits = 0
+_misses = 0
+_evictions = 0
+
+def _hash_key(sampling_key: str) -> str:
+    return hashlib.sha256(sampling_key.encode()).hexdigest()
+
+def lookup(video_sha256: str, model_version: str,
+           sampling_key: str) -> Optional[Tuple[str, str, float, Optional[int]]]:
+    """Return a cached (feedback, label, confidence, source video_id) or None"""
+    global _hits, _misses
+    sampling_key = _hash_key(sampling_key)
+    conn = get_connection()
+    if not conn:
+        return None
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute(
+            """SELECT feedback_text, class_label, confidence, source_video_id FROM analysis_cache
+               WHERE video_sha256 = %s AND model_version = %s AND sampling_key = %s""",
+            (video_sha256, model_version, sampling_key)
+        )
+        row = cursor.fetchone()
+
+        if row:
+            cursor.execute(
+                """UPDATE analysis_cache
+                   SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+                   WHERE video_sha256 = %s AND model_version = %s AND sampling_key = %s""",
+                (video_sha256, model_version, sampling_key)
+            )
+            conn.commit()
+
+        with _counter_lock:
+            if row:
+                _hits += 1
+            else:
+                _misses += 1
+
+        if not row:
+            return None
+        return row["feedback_text"], row["class_label"], row["confidence"], row["source_video_id"]
+
+    except Exception as e:
+        print(f"❌ Analysis cache lookup failed: {e}")
+        return None
+    finally:
+        close_connection(conn, cursor)
+
+def store(video_sha256: str, model_version: str, sampling_key: str,
+          feedback: str, label: str, confidence: float, source_video_id: Optional[int] = None):
+    """Cache an analysis result, evicting the least recently used entries over the limit"""
+    global _evictions
+    sampling_key = _hash_key(sampling_key)
+    conn = get_connection()
+    if not conn:
+        return
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """INSERT INTO analysis_cache
+               (video_sha256, model_version, sampling_key, class_label, confidence, feedback_text,
+                source_video_id)
+               VALUES (%s, %s, %s, %s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE class_label = VALUES(class_label),
+                   confidence = VALUES(confidence), feedback_text = VALUES(feedback_text),
+                   source_video_id = VALUES(source_video_id), last_hit_at = CURRENT_TIMESTAMP""",
+            (video_sha256, model_version, sampling_key, label, confidence, feedback, source_video_id)
+        )
+
+        cursor.execute("SELECT COUNT(*) FROM analysis_cache")
+        excess = cursor.fetchone()[0] - config.ANALYSIS_CACHE_MAX_ENTRIES
+        if excess > 0:
+            cursor.execute(
+                "DELETE FROM analysis_cache ORDER BY last_hit_at ASC LIMIT %s",
+                (excess,)
+            )
+            with _counter_lock:
+                _evictions += cursor.rowcount
+
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Analysis cache store failed: {e}")
+    finally:
+        close_connection(conn, cursor)
+
+def stats() -> dict:
+    """Hit/miss counters for this process"""
+    with _counter_lock:
+        lookups = _hits + _misses
+        return {
+            "hits": _hits,
+            "misses": _misses,
+            "evictions": _evictions,
+            "hit_rate": _hits / lookups if lookups else 0.0,
+            "max_entries": config.ANALYSIS_CACHE_MAX_ENTRIES
+        }
@@ -0,0 +1,116 @@
+import math
+import cv2
+import numpy as np
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+from app import config
+
+SAMPLING_MODES = ("uniform", "stride")
+
+@dataclass(frozen=True)
+class SamplingPolicy:
+    """Which frames of a video are sent to the classifier"""
+    target_fps: Optional[float] = None  # None analyzes every frame
+    max_frames: Optional[int] = None    # None analyzes the whole clip
+    mode: str = "uniform"               # "uniform" spreads frames over the clip, "stride" keeps every Nth
+
+    def __post_init__(self):
+        if self.mode not in SAMPLING_MODES:
+            raise ValueError(f"Sampling mode must be one of {', '.join(SAMPLING_MODES)}")
+        if self.target_fps is not None and (not math.isfinite(self.target_fps) or self.target_fps <= 0):
+            raise ValueError("Target FPS must be a finite number greater than 0")
+        if self.max_frames is not None and self.max_frames < 1:
+            raise ValueError("Max frames must be at least 1")
+
+    def key(self) -> str:
+        """Stable string identifying this policy (used in cache keys)"""
+        fps = "all" if self.target_fps is None else f"{self.target_fps:g}"
+        max_frames = "all" if self.max_frames is None else str(self.max_frames)
+        return f"{self.mode}:fps={fps}:max={max_frames}"
+
+def default_policy() -> SamplingPolicy:
+    """Server-wide sampling policy from app.config"""
+    return SamplingPolicy(
+        target_fps=config.ANALYSIS_TARGET_FPS or None,
+        max_frames=config.ANALYSIS_MAX_FRAMES or None,
+        mode=config.ANALYSIS_SAMPLING_MODE
+    )
+
+def resolve_policy(
+    target_fps: Optional[float] = None,
+    max_frames: Optional[int] = None,
+    mode: Optional[str] = None
+) -> SamplingPolicy:
+    """Build a policy from per-request overrides, falling back to the server default"""
+    default = default_policy()
+    return SamplingPolicy(
+        target_fps=target_fps if target_fps is not None else default.target_fps,
+        max_frames=max_frames if max_frames is not None else default.max_frames,
+        mode=mode or default.mode
+    )
+
+def frame_stride(policy: SamplingPolicy, source_fps: float) -> int:
+    """Keep every Nth frame in "stride" mode"""
+    if policy.target_fps is None or source_fps <= 0:
+        return 1
+    return max(1, int(round(source_fps / policy.target_fps)))
+
+def plan_frame_indices(policy: SamplingPolicy, total_frames: int, source_fps: float) -> Optional[np.ndarray]:
+    """Frame indices to analyze, or None when they can only be chosen while reading (stride)"""
+    if policy.mode != "uniform" or total_frames <= 0:
+        return None
+
+    count = total_frames
+    if policy.target_fps is not None and source_fps > 0:
+        count = int(np.ceil(total_frames * policy.target_fps / source_fps))
+    if policy.max_frames is not None:
+        count = min(count, policy.max_frames)
+    count = max(1, min(count, total_frames))
+
+    return np.unique(np.linspace(0, total_frames - 1, count).round().astype(np.int64))
+
+def sampled_frame_count(policy: SamplingPolicy, total_frames: int, source_fps: float) -> int:
+    """How many frames iter_sampled_frames yields at most, going by the container's frame count"""
+    indices = plan_frame_indices(policy, total_frames, source_fps)
+    if indices is not None:
+        return len(indices)
+    count = -(-max(total_frames, 0) // frame_stride(policy, source_fps))
+    return min(count, policy.max_frames) if policy.max_frames is not None else count
+
+def iter_sampled_frames(cap, policy: SamplingPolicy) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Yield (frame_index, timestamp_sec, frame) for the frames selected by the policy.
+
+    Skipped frames are only grabbed, never retrieved, so they are not
+    decoded into images or resized.
+    """
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+    indices = plan_frame_indices(policy, total_frames, source_fps)
+    if indices is not None:
+        wanted = iter(indices.tolist())
+        stride = None
+    else:
+        wanted = None
+        stride = frame_stride(policy, source_fps)
+
+    next_index = next(wanted, None) if wanted is not None else 0
+    yielded = 0
+    frame_index = 0
+
+    while next_index is not None:
+        if policy.max_frames is not None and yielded >= policy.max_frames:
+            break
+        if not cap.grab():
+            break
+
+        if frame_index == next_index:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            timestamp = frame_index / source_fps if source_fps > 0 else 0.0
+            yield frame_index, timestamp, frame
+            yielded += 1
+            next_index = next(wanted, None) if wanted is not None else frame_index + stride
+
+        frame_index += 1
@@ -0,0 +1,179 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+from app import config
+from app.db import get_connection, close_connection
+from app.utils import inference_pool, metrics, model_registry
+from app.utils.sampling import SamplingPolicy
+
+# Shadow evaluation of a candidate model (ZUMBA_SHADOW_MODEL_VERSION). A
+# sample of analyses is queued again for the candidate once production has
+# stored its result; one worker drains the queue on the pool's shadow
+# generation, so users never wait on the candidate. Both predictions go to
+# shadow_predictions, summarized by GET /admin/shadow. The candidate runs
+# niced, on one decode thread and often from the frame cache, so its wall
+# time is background latency; latencies are compared on the model time
+# per frame, measured inside each generation's inference call.
+
+@dataclass
+class ShadowJob:
+    video_id: int
+    source: str  # The file production analyzed
+    policy: Optional[SamplingPolicy]
+    production_version: Optional[str]
+    production_label: str
+    production_confidence: float
+    production_seconds: float
+    production_frame_seconds: Optional[float] = None
+
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+def enabled() -> bool:
+    return _queue is not None
+
+def start():
+    """Start the candidate model and the shadow worker, if a candidate is configured"""
+    global _queue, _worker, _executor
+    if not config.SHADOW_MODEL_VERSION or _queue is not None:
+        return
+    if config.ANALYSIS_MODE == "landmark":
+        print("⚠️ The landmark analysis mode does not use the model, shadow evaluation is off")
+        return
+    spec = model_registry.get_version(config.SHADOW_MODEL_VERSION)
+    if spec is None:
+        print(f"⚠️ Shadow model {config.SHADOW_MODEL_VERSION} is not registered, shadow evaluation is off")
+        return
+
+    inference_pool.start_shadow(spec)
+    _queue = asyncio.Queue(maxsize=max(1, config.SHADOW_MAX_QUEUE))
+    _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+    _worker = asyncio.create_task(_run())
+
+async def stop():
+    global _queue, _worker, _executor
+    if _worker is not None:
+        _worker.cancel()
+        await asyncio.gather(_worker, return_exceptions=True)
+    if _executor:
+        _executor.shutdown(wait=False)
+    _queue = None
+    _worker = None
+    _executor = None
+
+def offer(job: ShadowJob) -> bool:
+    """Queue a sampled production result for the candidate; never blocks"""
+    if _queue is None or random.random() >= config.SHADOW_SAMPLE_RATE:
+        return False
+    try:
+        _queue.put_nowait(job)
+    except asyncio.QueueFull:
+        # Shadow traffic is shed rather than allowed to build up behind uploads
+        metrics.shadow_total.inc("dropped")
+        return False
+    metrics.shadow_total.inc("queued")
+    return True
+
+async def _run():
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await _queue.get()
+        try:
+            await evaluate(job, loop)
+        except Exception as e:
+            metrics.failures_total.inc("shadow")
+            print(f"❌ Shadow analysis of video {job.video_id} crashed: {e}")
+        finally:
+            _queue.task_done()
+
+async def evaluate(job: ShadowJob, loop: asyncio.AbstractEventLoop):
+    """Run the candidate on one video and store both predictions"""
+    from app.utils.ml_pipeline import AnalysisStats
+    stats = AnalysisStats()
+    start = time.perf_counter()
+    try:
+        # No observers: key frames and timelines stay production's
+        _, label, confidence = await inference_pool.submit(
+            job.source, job.policy, (), None, stats, job.video_id, shadow=True
+        )
+    except Exception as e:
+        label, confidence = "failed", 0.0
+        print(f"❌ Shadow analysis of video {job.video_id} failed: {e}")
+    seconds = time.perf_counter() - start
+
+    if label == "failed":
+        metrics.shadow_total.inc("failed")
+        return
+    await loop.run_in_executor(
+        _executor, save_prediction, job, stats.model_version or inference_pool.shadow_version(),
+        label, confidence, seconds, stats.predict_seconds_per_frame()
+    )
+    metrics.shadow_total.inc("agreed" if label == job.production_label else "disagreed")
+
+def save_prediction(job: ShadowJob, shadow_version: str, label: str, confidence: float, seconds: float,
+                    frame_seconds: Optional[float] = None):
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """INSERT INTO shadow_predictions
+               (video_id, production_version, production_label, production_confidence, production_seconds,
+                shadow_version, shadow_label, shadow_confidence, shadow_seconds,
+                production_frame_seconds, shadow_frame_seconds)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+            (job.video_id, job.production_version, job.production_label, job.production_confidence,
+             job.production_seconds, shadow_version, label, confidence, seconds,
+             job.production_frame_seconds, frame_seconds)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+def summary() -> List[dict]:
+    """Agreement and model latency per (shadow, production) model pair"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute("""
+            SELECT shadow_version, production_version, COUNT(*) AS samples,
+                   AVG(CASE WHEN shadow_label = production_label THEN 1.0 ELSE 0.0 END) AS agreement_rate,
+                   AVG(ABS(shadow_confidence - production_confidence)) AS mean_confidence_diff,
+                   AVG(production_seconds) AS production_mean_seconds,
+                   AVG(shadow_seconds) AS shadow_background_mean_seconds,
+                   AVG(production_frame_seconds) AS production_frame_seconds,
+                   AVG(shadow_frame_seconds) AS shadow_frame_seconds,
+                   MAX(created_at) AS last_sample
+            FROM shadow_predictions
+            GROUP BY shadow_version, production_version
+            ORDER BY last_sample DESC
+        """)
+        rows = cursor.fetchall()
+    finally:
+        close_connection(conn, cursor)
+
+    for row in rows:
+        for key in ("agreement_rate", "mean_confidence_diff", "production_mean_seconds",
+                    "shadow_background_mean_seconds"):
+            row[key] = round(float(row[key]), 4)
+        # Per analyzed frame, from the model time on each side; negative when the candidate is faster
+        row["latency_diff_seconds"] = None
+        for key in ("production_frame_seconds", "shadow_frame_seconds"):
+            row[key] = round(float(row[key]), 6) if row[key] is not None else None
+        if row["production_frame_seconds"] is not None and row["shadow_frame_seconds"] is not None:
+            row["latency_diff_seconds"] = round(row["shadow_frame_seconds"] - row["production_frame_seconds"], 6)
+    return rows
@@ -0,0 +1,183 @@
+import glob
+import hashlib
+import os
+import shutil
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+from app import config
+from app.db import get_connection, close_connection
+
+# A thumbnail and a sprite sheet (one row of evenly spaced tiles, for
+# scrubbing) per video, picked from the frames the analysis already
+# decodes. Files are named after a hash of their content, so they can be
+# served as immutable and a reanalysis never shows a stale image.
+
+MEDIA_TYPES = {".webp": "image/webp", ".jpg": "image/jpeg"}
+
+def resize_to_width(frame: np.ndarray, width: int) -> np.ndarray:
+    """Scale a frame to the given width, keeping its aspect (never upscaled), height rounded to even"""
+    height, frame_width = frame.shape[:2]
+    if frame_width <= width:
+        return frame.copy()
+    return cv2.resize(frame, (width, max(2, round(height * width / frame_width / 2) * 2)),
+                      interpolation=cv2.INTER_AREA)
+
+def encode(image: np.ndarray, image_format: str = config.THUMBNAIL_FORMAT,
+           quality: int = config.THUMBNAIL_QUALITY) -> Tuple[bytes, str]:
+    """(encoded bytes, extension); falls back to JPEG when OpenCV was built without WebP"""
+    if image_format == "webp":
+        ok, data = cv2.imencode(".webp", image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+        if ok:
+            return data.tobytes(), ".webp"
+    ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("Could not encode image")
+    return data.tobytes(), ".jpg"
+
+class ThumbnailSampler:
+    """Collects sprite tiles and the thumbnail from the sampled frame stream of one video.
+
+    The video's length is not known up front, so every interval-th frame
+    becomes a tile and, whenever twice the wanted number of tiles has
+    piled up, every other tile is dropped and the interval doubles: tiles
+    stay evenly spaced and memory stays bounded. The thumbnail is the
+    sharpest well-exposed frame among the tiles.
+    """
+
+    def __init__(self, tiles: int = config.SPRITE_TILES, tile_width: int = config.SPRITE_TILE_WIDTH,
+                 thumbnail_width: int = config.THUMBNAIL_WIDTH):
+        self.tiles = max(1, tiles)
+        self.tile_width = tile_width
+        self.thumbnail_width = thumbnail_width
+        self._tiles: List[np.ndarray] = []
+        self._interval = 1
+        self._seen = 0
+        self._thumbnail: Optional[np.ndarray] = None
+        self._thumbnail_score = -1.0
+
+    def __call__(self, frame_index: int, timestamp_sec: float, frame: np.ndarray):
+        """Frame observer hook for ml_pipeline.analyze_video"""
+        self._seen += 1
+        if (self._seen - 1) % self._interval:
+            return
+        tile = resize_to_width(frame, self.tile_width)
+        if self._tiles and tile.shape != self._tiles[0].shape:
+            tile = cv2.resize(tile, (self._tiles[0].shape[1], self._tiles[0].shape[0]), interpolation=cv2.INTER_AREA)
+        self._tiles.append(tile)
+        if len(self._tiles) >= 2 * self.tiles:
+            self._tiles = self._tiles[::2]
+            self._interval *= 2
+
+        gray = cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+        score = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        # Fades to black or white make poor thumbnails
+        if not 40 <= gray.mean() <= 215:
+            score *= 0.1
+        if score > self._thumbnail_score:
+            self._thumbnail_score = score
+            self._thumbnail = resize_to_width(frame, self.thumbnail_width)
+
+    def thumbnail(self) -> Optional[np.ndarray]:
+        return self._thumbnail
+
+    def sprite_tiles(self) -> int:
+        return min(self.tiles, len(self._tiles))
+
+    def sprite(self) -> Optional[np.ndarray]:
+        """sprite_tiles() evenly spaced tiles side by side, None if no frame was seen"""
+        if not self._tiles:
+            return None
+        picks = np.linspace(0, len(self._tiles) - 1, self.sprite_tiles()).round().astype(int)
+        return np.hstack([self._tiles[i] for i in picks])
+
+def _write(directory: str, name: str, image: np.ndarray) -> str:
+    data, extension = encode(image)
+    path = os.path.join(directory, f"{name}-{hashlib.sha1(data).hexdigest()[:12]}{extension}")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def save_thumbnails(video_id: int, sampler: ThumbnailSampler) -> Optional[Tuple[str, str, int]]:
+    """Write the video's thumbnail and sprite and record them on its videos row.
+
+    Returns (thumbnail_path, sprite_path, sprite_tiles), or None when the
+    sampler saw no frames.
+    """
+    thumbnail = sampler.thumbnail()
+    sprite = sampler.sprite()
+    if thumbnail is None or sprite is None:
+        return None
+
+    directory = os.path.join(config.THUMBNAILS_DIR, str(video_id))
+    os.makedirs(directory, exist_ok=True)
+    stale = glob.glob(os.path.join(directory, "*"))
+    thumbnail_path = _write(directory, "thumb", thumbnail)
+    sprite_path = _write(directory, "sprite", sprite)
+    sprite_tiles = sampler.sprite_tiles()
+
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "UPDATE videos SET thumbnail_path = %s, sprite_path = %s, sprite_tiles = %s WHERE video_id = %s",
+            (thumbnail_path, sprite_path, sprite_tiles, video_id)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+    # Old images go only once the row points at the new ones
+    for path in stale:
+        if path not in (thumbnail_path, sprite_path):
+            os.remove(path)
+    return thumbnail_path, sprite_path, sprite_tiles
+
+def copy_thumbnails(source_video_id: int, video_id: int) -> bool:
+    """Give video_id copies of source_video_id's thumbnail and sprite; False when the source has none"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute(
+            "SELECT thumbnail_path, sprite_path, sprite_tiles FROM videos WHERE video_id = %s",
+            (source_video_id,)
+        )
+        source = cursor.fetchone()
+        if (not source or not source["thumbnail_path"] or not os.path.exists(source["thumbnail_path"])
+                or not os.path.exists(source["sprite_path"])):
+            return False
+
+        # Copied rather than shared: a reanalysis of the source removes its old images
+        directory = os.path.join(config.THUMBNAILS_DIR, str(video_id))
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for path in (source["thumbnail_path"], source["sprite_path"]):
+            paths.append(os.path.join(directory, os.path.basename(path)))
+            shutil.copyfile(path, paths[-1])
+
+        cursor.execute(
+            "UPDATE videos SET thumbnail_path = %s, sprite_path = %s, sprite_tiles = %s WHERE video_id = %s",
+            (*paths, source["sprite_tiles"], video_id)
+        )
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+def version(path: str) -> str:
+    """Content hash in an image's file name, for cache-busting URLs"""
+    return os.path.splitext(os.path.basename(path))[0].rsplit("-", 1)[-1]
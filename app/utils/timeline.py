@@ -0,0 +1,168 @@
+import json
+import numpy as np
+from dataclasses import dataclass
+from typing import List, Sequence
+from app import config
+from app.db import get_connection, close_connection
+from app.utils.ml_pipeline import class_labels
+
+@dataclass
+class Segment:
+    start_sec: float
+    end_sec: float
+    label: str
+    confidence: float  # Mean probability of label over the segment's frames
+
+class TimelineRecorder:
+    """Collects timestamped class probabilities during one analysis, in playback order"""
+
+    def __init__(self):
+        self._timestamps: List[np.ndarray] = []
+        self._probs: List[np.ndarray] = []
+
+    def record(self, timestamps: Sequence[float], probs: np.ndarray):
+        self._timestamps.append(np.asarray(timestamps, dtype=np.float64))
+        self._probs.append(np.asarray(probs, dtype=np.float32))
+
+    def reset(self):
+        self._timestamps.clear()
+        self._probs.clear()
+
+    def segments(self) -> List["Segment"]:
+        if not self._timestamps:
+            return []
+        return segment_timeline(np.concatenate(self._timestamps), np.concatenate(self._probs))
+
+def smooth_probabilities(probs: np.ndarray, window: int) -> np.ndarray:
+    """Centered moving average of (T, C) probabilities; edges average over the frames available"""
+    if window <= 1 or len(probs) < 2:
+        return probs.astype(np.float64)
+    half = window // 2
+    padded = np.concatenate([np.zeros((1, probs.shape[1])), np.cumsum(probs, axis=0, dtype=np.float64)])
+    idx = np.arange(len(probs))
+    lo = np.maximum(idx - half, 0)
+    hi = np.minimum(idx + half + 1, len(probs))
+    return (padded[hi] - padded[lo]) / (hi - lo)[:, None]
+
+def _runs(labels: np.ndarray) -> List[List[int]]:
+    """[start, end, label] for every run of equal labels, end exclusive"""
+    boundaries = np.flatnonzero(np.diff(labels)) + 1
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [len(labels)]])
+    return [[int(s), int(e), int(labels[s])] for s, e in zip(starts, ends)]
+
+def segment_timeline(
+    timestamps: np.ndarray,
+    probs: np.ndarray,
+    smoothing_sec: float = config.TIMELINE_SMOOTHING_SEC,
+    min_segment_sec: float = config.TIMELINE_MIN_SEGMENT_SEC
+) -> List[Segment]:
+    """Split per-frame (T, C) class probabilities into labelled segments.
+
+    Probabilities are smoothed with a sliding window, a change point is
+    placed wherever the smoothed top label changes, and segments shorter
+    than min_segment_sec are merged into the neighbour that explains
+    their frames best, so single noisy frames do not open a segment.
+    """
+    if len(timestamps) == 0:
+        return []
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, probs = timestamps[order], probs[order]
+
+    step = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 1.0
+    step = step if step > 0 else 1.0
+    smoothed = smooth_probabilities(probs, int(round(smoothing_sec / step)))
+    runs = _runs(np.argmax(smoothed, axis=1))
+
+    # Segment i covers [its first timestamp, the next segment's first timestamp)
+    def duration(run):
+        end = timestamps[run[1]] if run[1] < len(timestamps) else timestamps[-1] + step
+        return end - timestamps[run[0]]
+
+    while len(runs) > 1:
+        short = [i for i, run in enumerate(runs) if duration(run) < min_segment_sec]
+        if not short:
+            break
+        i = min(short, key=lambda j: duration(runs[j]))
+        start, end, _ = runs[i]
+        neighbours = [j for j in (i - 1, i + 1) if 0 <= j < len(runs)]
+        target = max(neighbours, key=lambda j: smoothed[start:end, runs[j][2]].mean())
+        runs[target][0] = min(runs[target][0], start)
+        runs[target][1] = max(runs[target][1], end)
+        del runs[i]
+        # Merging can leave equal labels side by side
+        merged = [runs[0]]
+        for run in runs[1:]:
+            if run[2] == merged[-1][2]:
+                merged[-1][1] = run[1]
+            else:
+                merged.append(run)
+        runs = merged
+
+    return [
+        Segment(
+            start_sec=float(timestamps[start]),
+            end_sec=float(timestamps[end] if end < len(timestamps) else timestamps[-1] + step),
+            label=class_labels[label],
+            confidence=float(probs[start:end, label].mean())
+        )
+        for start, end, label in runs
+    ]
+
+def encode_segments(segments: Sequence[Segment]) -> str:
+    """Compact JSON: [[start_sec, end_sec, class_labels index, confidence], ...]"""
+    return json.dumps(
+        [[round(s.start_sec, 2), round(s.end_sec, 2), class_labels.index(s.label), round(s.confidence, 3)]
+         for s in segments],
+        separators=(",", ":")
+    )
+
+def decode_segments(data: str) -> List[Segment]:
+    return [
+        Segment(start_sec=start, end_sec=end, label=class_labels[label], confidence=confidence)
+        for start, end, label, confidence in json.loads(data)
+    ]
+
+def save_timeline(video_id: int, segments: Sequence[Segment]):
+    """Store (or replace) a video's segments as a single row"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """INSERT INTO video_timelines (video_id, segments)
+               VALUES (%s, %s)
+               ON DUPLICATE KEY UPDATE segments = VALUES(segments), created_at = CURRENT_TIMESTAMP""",
+            (video_id, encode_segments(segments))
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+def copy_timeline(source_video_id: int, video_id: int) -> bool:
+    """Give video_id the segments of source_video_id; False when the source has none"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """INSERT INTO video_timelines (video_id, segments)
+               SELECT %s, segments FROM video_timelines WHERE video_id = %s""",
+            (video_id, source_video_id)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
@@ -0,0 +1,172 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from multipart.multipart import MultipartParser, parse_options_header
+from app import config
+
+# Enough bytes to recognise every supported container
+SNIFF_BYTES = 12
+# Multipart text fields (user_id, sampling options, ...) are tiny
+MAX_FIELD_BYTES = 64 * 1024
+
+class UploadRejected(Exception):
+    """An upload refused while streaming; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def sniff_container(head: bytes) -> Optional[str]:
+    """Container format from a file's first bytes: "mp4", "mov", "webm" or None"""
+    if len(head) >= 12 and head[4:8] == b"ftyp":
+        return "mov" if head[8:12] == b"qt  " else "mp4"
+    # QuickTime files written before ftyp was introduced start with another top-level atom
+    if len(head) >= 8 and head[4:8] in (b"moov", b"mdat", b"wide", b"free", b"skip"):
+        return "mov"
+    # EBML header, shared by WebM and Matroska
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    return None
+
+def check_container(head: bytes):
+    if sniff_container(head) is None:
+        raise UploadRejected(415, "Unsupported video format, upload an MP4, MOV or WebM file")
+
+def max_upload_bytes() -> int:
+    return config.UPLOAD_MAX_MB * 1024 * 1024
+
+@dataclass
+class StreamedUpload:
+    fields: Dict[str, str]
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    container: Optional[str] = None
+    size: int = 0
+    sha256: Optional[str] = None
+
+@dataclass
+class _Part:
+    headers: Dict[bytes, bytes] = field(default_factory=dict)
+    header_field: bytes = b""
+    header_value: bytes = b""
+    name: Optional[str] = None
+    filename: Optional[str] = None
+    data: List[bytes] = field(default_factory=list)
+    size: int = 0
+
+def _write(f, digest, data: bytes):
+    f.write(data)
+    digest.update(data)
+
+async def save_multipart_upload(request: Request, file_field: str, dest_path: str,
+                                max_bytes: Optional[int] = None) -> StreamedUpload:
+    """Stream a multipart/form-data request, writing the file_field part to dest_path.
+
+    The body is parsed as it arrives instead of being spooled first, so
+    a body over max_bytes or a file whose first bytes are not an MP4,
+    MOV or WebM container is refused (UploadRejected) after the first
+    network chunks. Disk writes and hashing run in the threadpool, never
+    on the event loop. The caller removes dest_path on failure.
+    """
+    max_bytes = max_upload_bytes() if max_bytes is None else max_bytes
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected(400, "Expected a multipart/form-data body")
+
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        try:
+            declared = int(declared)
+        except ValueError:
+            declared = -1
+        if declared < 0:
+            raise UploadRejected(400, "Invalid Content-Length header")
+        if declared > max_bytes + MAX_FIELD_BYTES:
+            raise UploadRejected(413, f"Video is larger than {config.UPLOAD_MAX_MB} MB")
+
+    upload = StreamedUpload(fields={})
+    part = _Part()
+    file_data: List[bytes] = []  # File bytes parsed from the current network chunk
+    digest = hashlib.sha256()
+    head = b""
+
+    def on_part_begin():
+        nonlocal part
+        part = _Part()
+
+    def on_header_field(data, start, end):
+        part.header_field += data[start:end]
+
+    def on_header_value(data, start, end):
+        part.header_value += data[start:end]
+
+    def on_header_end():
+        part.headers[part.header_field.lower()] = part.header_value
+        part.header_field = part.header_value = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part.headers.get(b"content-disposition", b""))
+        part.name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in disposition:
+            part.filename = disposition[b"filename"].decode("utf-8", "replace")
+        if part.name == file_field:
+            upload.filename = part.filename
+            upload.content_type = part.headers.get(b"content-type", b"").decode("latin-1")
+            if not upload.content_type.startswith("video/"):
+                raise UploadRejected(400, "Please upload a video file")
+
+    def on_part_data(data, start, end):
+        part.size += end - start
+        if part.name == file_field:
+            if part.size > max_bytes:
+                raise UploadRejected(413, f"Video is larger than {config.UPLOAD_MAX_MB} MB")
+            file_data.append(data[start:end])
+        elif part.size > MAX_FIELD_BYTES:
+            raise UploadRejected(413, f"Form field {part.name} is too large")
+        else:
+            part.data.append(data[start:end])
+
+    def on_part_end():
+        if part.name != file_field and part.name:
+            upload.fields[part.name] = b"".join(part.data).decode("utf-8", "replace")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    with open(dest_path, "wb") as f:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if not file_data:
+                continue
+            data = b"".join(file_data)
+            file_data.clear()
+
+            # Decided on the first few KB, before the rest of the body is transferred
+            if upload.container is None:
+                head += data[:SNIFF_BYTES - len(head)]
+                if len(head) >= SNIFF_BYTES:
+                    check_container(head)
+                    upload.container = sniff_container(head)
+
+            await run_in_threadpool(_write, f, digest, data)
+            upload.size += len(data)
+        parser.finalize()
+
+    if upload.filename is None:
+        raise UploadRejected(400, f"Missing file field '{file_field}'")
+    if upload.container is None:
+        # Files shorter than SNIFF_BYTES
+        check_container(head)
+        upload.container = sniff_container(head)
+    upload.sha256 = digest.hexdigest()
+    return upload
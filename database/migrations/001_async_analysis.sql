@@ -0,0 +1,8 @@
+-- Videos are stored as 'pending' before analysis runs, so the label is
+-- unknown at insert time and the confidence is filled in by the worker
+USE zumbafitpro;
+
+ALTER TABLE videos
+    MODIFY class_label ENUM('Squat_Correct', 'Squat_Incorrect', 'Arm_Raise_Correct',
+                            'Arm_Raise_Incorrect', 'Knee_Extension_Correct', 'Knee_Extension_Incorrect') NULL,
+    ADD COLUMN confidence FLOAT AFTER class_label;
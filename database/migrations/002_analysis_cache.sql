@@ -0,0 +1,20 @@
+-- Uploads are hashed so re-uploads of the same clip can reuse a cached result
+USE zumbafitpro;
+
+ALTER TABLE videos
+    ADD COLUMN video_sha256 CHAR(64) AFTER file_path;
+
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    video_sha256 CHAR(64) NOT NULL,
+    model_version VARCHAR(64) NOT NULL,
+    sampling_key VARCHAR(64) NOT NULL,
+    class_label ENUM('Squat_Correct', 'Squat_Incorrect', 'Arm_Raise_Correct', 
+                    'Arm_Raise_Incorrect', 'Knee_Extension_Correct', 'Knee_Extension_Incorrect') NOT NULL,
+    confidence FLOAT NOT NULL,
+    feedback_text TEXT,
+    hit_count INT DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (video_sha256, model_version, sampling_key),
+    INDEX idx_analysis_cache_last_hit (last_hit_at)
+);
@@ -0,0 +1,9 @@
+-- Per-segment exercise timeline, served by GET /video/{video_id}/timeline
+USE zumbafitpro;
+
+CREATE TABLE IF NOT EXISTS video_timelines (
+    video_id INT PRIMARY KEY,
+    segments JSON NOT NULL,  -- [[start_sec, end_sec, label_index, confidence], ...]
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE
+);
@@ -0,0 +1,5 @@
+-- Number of sampled frames behind each result, to measure early-exit savings
+USE zumbafitpro;
+
+ALTER TABLE videos
+    ADD COLUMN frames_analyzed INT AFTER confidence;
@@ -0,0 +1,27 @@
+-- Resumable chunked uploads (POST /video/uploads)
+USE zumbafitpro;
+
+-- Uploads in progress; rows are removed on finalize or after the TTL
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    upload_id CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    total_size BIGINT NOT NULL,
+    exercise_type VARCHAR(50),
+    sample_fps FLOAT,  -- Sampling overrides given at initiate
+    max_frames INT,
+    sampling_mode VARCHAR(16),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,  -- Last chunk received, drives garbage collection
+    INDEX idx_upload_sessions_updated (updated_at),
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+-- Byte ranges received per chunked upload
+CREATE TABLE IF NOT EXISTS upload_chunks (
+    upload_id CHAR(32) NOT NULL,
+    start_offset BIGINT NOT NULL,
+    end_offset BIGINT NOT NULL,  -- Exclusive
+    PRIMARY KEY (upload_id, start_offset),
+    FOREIGN KEY (upload_id) REFERENCES upload_sessions(upload_id) ON DELETE CASCADE
+);
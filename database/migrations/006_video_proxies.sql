@@ -0,0 +1,5 @@
+-- Low-resolution proxy of each upload, read by analysis and previews
+USE zumbafitpro;
+
+ALTER TABLE videos
+    ADD COLUMN proxy_path VARCHAR(255) AFTER file_path;
@@ -0,0 +1,6 @@
+-- Model version behind each result, so reanalysis can select rows by model
+USE zumbafitpro;
+
+ALTER TABLE videos
+    ADD COLUMN model_version VARCHAR(64) AFTER frames_analyzed,
+    ADD INDEX idx_videos_model_version (model_version);
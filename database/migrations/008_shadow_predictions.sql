@@ -0,0 +1,18 @@
+-- Candidate-model predictions recorded next to production's, summarized by GET /admin/shadow
+USE zumbafitpro;
+
+CREATE TABLE IF NOT EXISTS shadow_predictions (
+    shadow_id INT AUTO_INCREMENT PRIMARY KEY,
+    video_id INT NOT NULL,
+    production_version VARCHAR(64),
+    production_label VARCHAR(100) NOT NULL,
+    production_confidence FLOAT NOT NULL,
+    production_seconds FLOAT NOT NULL,  -- Analysis wall time
+    shadow_version VARCHAR(64) NOT NULL,
+    shadow_label VARCHAR(100) NOT NULL,
+    shadow_confidence FLOAT NOT NULL,
+    shadow_seconds FLOAT NOT NULL,  -- Background wall time, not comparable with production_seconds
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_shadow_versions (shadow_version, production_version),
+    FOREIGN KEY (video_id) REFERENCES videos(video_id) ON DELETE CASCADE
+);
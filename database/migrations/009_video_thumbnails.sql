@@ -0,0 +1,7 @@
+-- Thumbnail and scrubbing sprite sheet of each upload, shown in the admin video grid
+USE zumbafitpro;
+
+ALTER TABLE videos
+    ADD COLUMN thumbnail_path VARCHAR(255) AFTER proxy_path,
+    ADD COLUMN sprite_path VARCHAR(255) AFTER thumbnail_path,
+    ADD COLUMN sprite_tiles INT AFTER sprite_path;
@@ -0,0 +1,7 @@
+-- Per-upload sampling policy, so uploads requeued after a restart are analyzed with it
+USE zumbafitpro;
+
+ALTER TABLE videos
+    ADD COLUMN sample_fps FLOAT AFTER model_version,
+    ADD COLUMN max_frames INT AFTER sample_fps,
+    ADD COLUMN sampling_mode VARCHAR(16) AFTER max_frames;
@@ -0,0 +1,6 @@
+-- Model time per frame on both sides of a shadow sample, comparable unlike the wall times
+USE zumbafitpro;
+
+ALTER TABLE shadow_predictions
+    ADD COLUMN production_frame_seconds FLOAT AFTER shadow_seconds,
+    ADD COLUMN shadow_frame_seconds FLOAT AFTER production_frame_seconds;
@@ -0,0 +1,6 @@
+-- Upload each cached result was computed on, so cache hits can reuse its thumbnails
+USE zumbafitpro;
+
+ALTER TABLE analysis_cache
+    ADD COLUMN source_video_id INT AFTER feedback_text,
+    ADD FOREIGN KEY (source_video_id) REFERENCES videos(video_id) ON DELETE SET NULL;
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+ZumbaFit Pro Analysis Pipeline Benchmark
+Runs analyze_video offline on synthetic clips of different lengths,
+resolutions and frame rates, with a small stand-in model in place of
+zumba_model.h5. Reports frames/sec, p50/p95 latency per video and peak
+RSS for each pipeline mode, and writes JSON for tracking regressions.
+
+Each mode runs in a fresh process so peak RSS is measured per mode.
+
+Usage (from the project root):
+    python scripts/benchmark_pipeline.py
+    python scripts/benchmark_pipeline.py --clips short-480p-30 --modes sequential pipelined --output bench.json
+    python scripts/benchmark_pipeline.py --baseline bench.json --max-regression 0.1
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cv2
+import numpy as np
+
+@dataclass
+class ClipSpec:
+    seconds: float
+    width: int
+    height: int
+    fps: int
+
+CLIPS = {
+    "short-480p-30": ClipSpec(10, 640, 480, 30),
+    "short-720p-60": ClipSpec(10, 1280, 720, 60),
+    "long-720p-30": ClipSpec(60, 1280, 720, 30),
+    "short-1080p-24": ClipSpec(10, 1920, 1080, 24),
+}
+
+# Pipeline modes as ZUMBA_* settings, applied before the app is imported
+MODES = {
+    "sequential": {"ZUMBA_ANALYSIS_MODE": "cnn", "ZUMBA_PIPELINE_ENABLED": "false"},
+    "pipelined": {"ZUMBA_ANALYSIS_MODE": "cnn", "ZUMBA_PIPELINE_ENABLED": "true"},
+    "early-exit": {"ZUMBA_ANALYSIS_MODE": "cnn", "ZUMBA_PIPELINE_ENABLED": "true",
+                   "ZUMBA_EARLY_EXIT_ENABLED": "true"},
+    "landmark": {"ZUMBA_ANALYSIS_MODE": "landmark"},
+    "cascade": {"ZUMBA_ANALYSIS_MODE": "cascade"},
+}
+
+class StandInModel:
+    """Offline replacement for the CNN: pooled pixels through a fixed random projection.
+
+    ms_per_frame adds a sleep per frame to emulate the real model's cost
+    (like TensorFlow, it releases the GIL while "running").
+    """
+
+    def __init__(self, num_classes: int = 6, ms_per_frame: float = 0.0, seed: int = 0):
+        self.weights = np.random.default_rng(seed).normal(size=(8 * 8 * 3, num_classes)).astype(np.float32)
+        self.ms_per_frame = ms_per_frame
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        n, height, width, channels = batch.shape
+        pooled = batch.reshape(n, 8, height // 8, 8, width // 8, channels).mean(axis=(2, 4))
+        logits = pooled.reshape(n, -1) @ self.weights
+        if self.ms_per_frame:
+            time.sleep(self.ms_per_frame * n / 1000.0)
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+def write_clip(path: str, spec: ClipSpec):
+    """A figure-like blob bobbing over a noisy gradient, so the codec has real work to do"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), spec.fps, (spec.width, spec.height))
+    if not writer.isOpened():
+        raise RuntimeError(f"cv2.VideoWriter could not open {path}")
+
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(40, 200, spec.width, dtype=np.float32)[None, :, None]
+    background = np.broadcast_to(gradient, (spec.height, spec.width, 3)).astype(np.uint8)
+    noise = rng.integers(0, 24, size=(4, spec.height, spec.width, 3), dtype=np.uint8)
+    scale = spec.height / 480
+
+    try:
+        for i in range(int(spec.seconds * spec.fps)):
+            t = i / spec.fps
+            frame = cv2.add(background, noise[i % len(noise)])
+            cx = int(spec.width / 2 + spec.width / 4 * np.sin(t * 0.5))
+            cy = int(spec.height / 2 + 40 * scale * np.sin(t * 2.0))
+            cv2.circle(frame, (cx, cy - int(90 * scale)), int(25 * scale), (60, 60, 220), -1)
+            cv2.rectangle(frame, (cx - int(30 * scale), cy - int(60 * scale)),
+                          (cx + int(30 * scale), cy + int(60 * scale)), (220, 120, 60), -1)
+            arm = int(60 * scale * np.sin(t * 2.0))
+            cv2.line(frame, (cx - int(30 * scale), cy - int(50 * scale)),
+                     (cx - int(80 * scale), cy - int(50 * scale) - arm), (220, 120, 60), int(12 * scale))
+            cv2.line(frame, (cx + int(30 * scale), cy - int(50 * scale)),
+                     (cx + int(80 * scale), cy - int(50 * scale) - arm), (220, 120, 60), int(12 * scale))
+            writer.write(frame)
+    finally:
+        writer.release()
+
+def ensure_clips(names, fixtures_dir: str) -> dict:
+    """Paths of the requested fixture clips, generating the missing ones"""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    paths = {}
+    for name in names:
+        spec = CLIPS[name]
+        path = os.path.join(fixtures_dir, f"{name}-{spec.seconds:g}s.mp4")
+        if not os.path.exists(path):
+            print(f"🔄 Generating {name} ({spec.seconds:g}s {spec.width}x{spec.height} @ {spec.fps} fps)")
+            write_clip(path, spec)
+        paths[name] = path
+    return paths
+
+def peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_mode(settings: dict, clip_paths: dict, repeats: int, ms_per_frame: float) -> dict:
+    """Benchmark one mode; runs in its own process"""
+    os.environ.update(settings)
+    from app.utils import ml_pipeline
+    from app.utils.sampling import default_policy
+
+    ml_pipeline.model = StandInModel(len(ml_pipeline.class_labels), ms_per_frame)
+    ml_pipeline._load_attempted = True
+    policy = default_policy()
+
+    # Warm-up: first-call costs (codec init, MediaPipe graph) are not part of the numbers
+    ml_pipeline.analyze_video(min(clip_paths.values(), key=os.path.getsize), policy)
+
+    videos = []
+    for name, path in clip_paths.items():
+        for _ in range(repeats):
+            stats = ml_pipeline.AnalysisStats()
+            start = time.perf_counter()
+            _, label, confidence = ml_pipeline.analyze_video(path, policy, stats=stats)
+            elapsed = time.perf_counter() - start
+            videos.append({
+                "clip": name,
+                "latency_ms": round(elapsed * 1000, 2),
+                "frames_analyzed": stats.frames_analyzed,
+                "stopped_early": stats.stopped_early,
+                "label": label,
+            })
+
+    latencies = np.array([v["latency_ms"] for v in videos])
+    total_frames = sum(v["frames_analyzed"] for v in videos)
+    return {
+        "frames_per_sec": round(total_frames / (latencies.sum() / 1000), 1) if latencies.sum() else 0.0,
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "sampling_policy": policy.key(),
+        "videos": videos,
+    }
+
+def compare(results: dict, baseline_path: str, max_regression: float) -> bool:
+    """Print throughput changes against a previous JSON report; False on a regression"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["modes"]
+
+    passed = True
+    print(f"\n📊 Compared with {baseline_path}")
+    for mode, result in results.items():
+        if mode not in baseline or not baseline[mode]["frames_per_sec"]:
+            continue
+        change = result["frames_per_sec"] / baseline[mode]["frames_per_sec"] - 1
+        ok = change >= -max_regression
+        passed = passed and ok
+        print(f"{'✅' if ok else '❌'} {mode}: {baseline[mode]['frames_per_sec']} -> "
+              f"{result['frames_per_sec']} frames/sec ({change:+.1%})")
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analyze_video on synthetic clips")
+    parser.add_argument("--clips", nargs="+", choices=list(CLIPS), default=list(CLIPS))
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per clip and mode")
+    parser.add_argument("--model-ms-per-frame", type=float, default=1.0,
+                        help="Simulated model cost per frame, 0 measures the pipeline alone")
+    parser.add_argument("--fixtures-dir", default=os.path.join(tempfile.gettempdir(), "zumbafit_benchmark_clips"),
+                        help="Generated clips are kept here and reused")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Previous JSON report to compare frames/sec with")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="Allowed frames/sec drop against the baseline (fraction)")
+    args = parser.parse_args()
+
+    print("🎵 ZumbaFit Pro Pipeline Benchmark")
+    print("=" * 50)
+
+    clip_paths = ensure_clips(args.clips, args.fixtures_dir)
+    context = multiprocessing.get_context("spawn")
+
+    results = {}
+    for mode in args.modes:
+        print(f"\n🔄 {mode}")
+        with context.Pool(1) as pool:
+            results[mode] = pool.apply(run_mode, (MODES[mode], clip_paths, args.repeats, args.model_ms_per_frame))
+        result = results[mode]
+        print(f"✅ {result['frames_per_sec']} frames/sec, p50 {result['latency_p50_ms']} ms, "
+              f"p95 {result['latency_p95_ms']} ms, peak RSS {result['peak_rss_mb']} MB")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+        },
+        "settings": {
+            "repeats": args.repeats,
+            "model_ms_per_frame": args.model_ms_per_frame,
+            "clips": {name: asdict(CLIPS[name]) for name in args.clips},
+        },
+        "modes": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+    print("\n" + "=" * 50)
+    print(f"{'mode':<12} {'frames/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'RSS MB':>8}")
+    for mode, result in results.items():
+        print(f"{mode:<12} {result['frames_per_sec']:>10} {result['latency_p50_ms']:>10} "
+              f"{result['latency_p95_ms']:>10} {result['peak_rss_mb']:>8}")
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+ZumbaFit Pro Preprocessing Micro-benchmark
+Compares the old per-frame preprocessing (resize copy, np.array, astype,
+division) with the buffer-reusing path in ml_pipeline: time per frame
+and bytes allocated per batch (tracemalloc peak above the baseline).
+
+Usage (from the project root):
+    python scripts/benchmark_preprocess.py
+    python scripts/benchmark_preprocess.py --width 1920 --height 1080 --batches 50
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cv2
+import numpy as np
+from app.utils.ml_pipeline import INPUT_SIZE, BatchBuffers, normalize_batch
+
+def preprocess_before(frames):
+    """The original path: one resized copy per frame, stacked, then converted and divided"""
+    batch = np.array([cv2.resize(frame, INPUT_SIZE) for frame in frames])
+    return batch.astype("float32") / 255.0
+
+def make_preprocess_after(batch_size: int):
+    buffers = BatchBuffers(1, batch_size)
+
+    def preprocess_after(frames):
+        """Resize into a reused uint8 buffer, normalize into a reused float32 buffer"""
+        batch = buffers.next()
+        for i, frame in enumerate(frames):
+            cv2.resize(frame, INPUT_SIZE, dst=batch[i])
+        return normalize_batch(batch[:len(frames)])
+
+    return preprocess_after
+
+def measure(preprocess, frames, batches: int) -> dict:
+    """Seconds per frame and the largest per-batch allocation, after one warm-up batch"""
+    preprocess(frames)
+
+    tracemalloc.start()
+    peak_bytes = 0
+    start = time.perf_counter()
+    for _ in range(batches):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        preprocess(frames)
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - baseline)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    # Timing without tracemalloc overhead
+    start = time.perf_counter()
+    for _ in range(batches):
+        preprocess(frames)
+    untraced = time.perf_counter() - start
+
+    return {
+        "us_per_frame": untraced / (batches * len(frames)) * 1e6,
+        "us_per_frame_traced": elapsed / (batches * len(frames)) * 1e6,
+        "bytes_per_batch": peak_bytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame preprocessing before/after buffer reuse")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batches", type=int, default=30)
+    args = parser.parse_args()
+
+    print("🎵 ZumbaFit Pro Preprocessing Benchmark")
+    print("=" * 50)
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, size=(args.height, args.width, 3), dtype=np.uint8)
+              for _ in range(args.batch_size)]
+    print(f"✅ {args.batch_size} synthetic {args.width}x{args.height} frames per batch, "
+          f"{args.batches} batches")
+
+    results = {
+        "before": measure(preprocess_before, frames, args.batches),
+        "after": measure(make_preprocess_after(args.batch_size), frames, args.batches),
+    }
+
+    print(f"\n{'path':<8} {'us/frame':>10} {'bytes/batch':>14} {'bytes/frame':>12}")
+    for name, result in results.items():
+        print(f"{name:<8} {result['us_per_frame']:>10.1f} {result['bytes_per_batch']:>14,} "
+              f"{result['bytes_per_batch'] // args.batch_size:>12,}")
+
+    before, after = results["before"], results["after"]
+    print("\n" + "=" * 50)
+    print(f"✅ {before['us_per_frame'] / after['us_per_frame']:.2f}x faster, "
+          f"{before['bytes_per_batch'] - after['bytes_per_batch']:,} fewer bytes allocated per batch")
+
+if __name__ == "__main__":
+    main()
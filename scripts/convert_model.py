@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+ZumbaFit Pro Model Conversion Script
+Exports the Keras model to TFLite (float32 / float16 / int8) and ONNX,
+then checks that every export agrees with Keras on real video frames.
+
+Usage (from the project root):
+    python scripts/convert_model.py
+    python scripts/convert_model.py --formats tflite-float16 onnx --tolerance 0.01
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cv2
+import numpy as np
+from app.utils.backends import DEFAULT_MODEL_PATHS, load_backend
+from app.utils.ml_pipeline import iter_frame_batches
+from app.utils.sampling import SamplingPolicy
+
+EXPORT_FORMATS = ["tflite", "tflite-float16", "tflite-int8", "onnx"]
+
+def load_sample_frames(video_glob: str, max_frames: int) -> np.ndarray:
+    """Preprocessed uint8 frames from sample videos, used for calibration and checks"""
+    policy = SamplingPolicy(target_fps=2, max_frames=max_frames, mode="uniform")
+    frames = []
+    for path in sorted(glob.glob(video_glob)):
+        cap = cv2.VideoCapture(path)
+        try:
+            for batch in iter_frame_batches(cap, policy):
+                # Batch buffers are reused, keep a copy
+                frames.extend(batch.copy())
+        finally:
+            cap.release()
+        if len(frames) >= max_frames:
+            break
+
+    if not frames:
+        print(f"⚠️  No frames found in {video_glob}, using random frames instead")
+        rng = np.random.default_rng(0)
+        return rng.integers(0, 256, size=(max_frames, 224, 224, 3), dtype=np.uint8)
+    return np.stack(frames[:max_frames])
+
+def export_tflite(keras_model, output_path: str, quantization: str, calibration: np.ndarray):
+    """Convert to TFLite, optionally quantizing weights to float16 or int8"""
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+
+    if quantization == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        def representative_dataset():
+            for frame in calibration:
+                yield [frame[np.newaxis].astype("float32") / 255.0]
+
+        # Int8 weights and activations, float32 in/out so the backend stays drop-in
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+def export_onnx(keras_model, output_path: str):
+    """Convert to ONNX with a dynamic batch dimension"""
+    import tensorflow as tf
+    try:
+        import tf2onnx
+    except ImportError:
+        raise ImportError("ONNX export needs tf2onnx (pip install tf2onnx onnxruntime)")
+
+    input_shape = keras_model.inputs[0].shape
+    signature = (tf.TensorSpec((None, *input_shape[1:]), tf.float32, name="frames"),)
+    tf2onnx.convert.from_keras(keras_model, input_signature=signature, opset=13, output_path=output_path)
+
+def predict_all(backend, frames: np.ndarray, batch_size: int) -> np.ndarray:
+    """Class probabilities for every frame, in batches"""
+    return np.concatenate([
+        backend.predict(frames[i:i + batch_size].astype("float32") / 255.0)
+        for i in range(0, len(frames), batch_size)
+    ])
+
+def check_agreement(reference: np.ndarray, frames: np.ndarray, backend, batch_size: int) -> dict:
+    """Compare a backend's probabilities with the Keras reference"""
+    preds = predict_all(backend, frames, batch_size)
+    return {
+        "max_abs_diff": float(np.max(np.abs(preds - reference))),
+        "top1_agreement": float(np.mean(np.argmax(preds, axis=1) == np.argmax(reference, axis=1))),
+        "mean_prob_diff": float(np.max(np.abs(preds.mean(axis=0) - reference.mean(axis=0)))),
+    }
+
+def main():
+    """Export the selected formats and verify them against Keras"""
+    parser = argparse.ArgumentParser(description="Export zumba_model.h5 to faster inference formats")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATHS["keras"], help="Keras model to convert")
+    parser.add_argument("--formats", nargs="+", choices=EXPORT_FORMATS, default=EXPORT_FORMATS)
+    parser.add_argument("--output-dir", default=None, help="Defaults to the Keras model's directory")
+    parser.add_argument("--videos", default="app/uploads/*.mp4", help="Glob of videos for calibration and checks")
+    parser.add_argument("--frames", type=int, default=128, help="Frames used for calibration and checks")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="Max allowed difference of the video-averaged class probabilities")
+    parser.add_argument("--min-agreement", type=float, default=0.95,
+                        help="Min fraction of frames whose top-1 label matches Keras")
+    args = parser.parse_args()
+
+    print("🎵 ZumbaFit Pro Model Conversion")
+    print("=" * 50)
+
+    keras_backend = load_backend("keras", args.model)
+    output_dir = args.output_dir or os.path.dirname(args.model)
+    frames = load_sample_frames(args.videos, args.frames)
+    print(f"✅ Loaded {args.model} and {len(frames)} sample frames")
+
+    reference = predict_all(keras_backend, frames, args.batch_size)
+
+    all_passed = True
+    for fmt in args.formats:
+        output_path = os.path.join(output_dir, os.path.basename(DEFAULT_MODEL_PATHS[fmt]))
+        print(f"\n🔄 Exporting {fmt} -> {output_path}")
+        try:
+            if fmt == "onnx":
+                export_onnx(keras_backend.model, output_path)
+            else:
+                quantization = fmt.split("-", 1)[1] if "-" in fmt else None
+                export_tflite(keras_backend.model, output_path, quantization, frames)
+            result = check_agreement(reference, frames, load_backend(fmt, output_path), args.batch_size)
+        except Exception as e:
+            print(f"❌ {fmt} failed: {e}")
+            all_passed = False
+            continue
+
+        passed = result["mean_prob_diff"] <= args.tolerance and result["top1_agreement"] >= args.min_agreement
+        all_passed = all_passed and passed
+        size_mb = os.path.getsize(output_path) / (1024 * 1024)
+        print(f"{'✅' if passed else '❌'} {fmt}: {size_mb:.1f} MB, "
+              f"top-1 agreement {result['top1_agreement']:.1%}, "
+              f"averaged prob diff {result['mean_prob_diff']:.4f}, "
+              f"max frame diff {result['max_abs_diff']:.4f}")
+
+    print("\n" + "=" * 50)
+    if all_passed:
+        print("✅ All exports agree with Keras; select one with ZUMBA_INFERENCE_BACKEND")
+    else:
+        print("❌ Some exports failed the accuracy check, keep using the keras backend for those")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+ZumbaFit Pro Bulk Reanalysis
+Re-runs analysis over existing rows of the videos table, selected by
+upload date, label and model version, on the inference worker pool.
+Results are written back to videos, feedback_reports and video_timelines
+in batches, and the progress is checkpointed after every batch: started
+again with the same filters and model, an interrupted run resumes where
+it stopped.
+
+Usage (from the project root):
+    python scripts/reanalyze.py --stale
+    python scripts/reanalyze.py --since 2025-01-01 --until 2025-03-31 --label Squat_Incorrect
+    python scripts/reanalyze.py --model-version unknown --workers 4 --batch-size 100
+    python scripts/reanalyze.py --stale --dry-run
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import config
+from app.db import get_connection, close_connection
+from app.utils import inference_pool, ml_pipeline, proxy
+from app.utils.sampling import resolve_policy
+from app.utils.timeline import TimelineRecorder, encode_segments
+
+def select_videos(args, current_version):
+    """Rows matching the filters, oldest video_id first"""
+    conditions = ["processing_status IN ('processed', 'failed')" if args.include_failed
+                  else "processing_status = 'processed'"]
+    params = []
+    if args.since:
+        conditions.append("upload_time >= %s")
+        params.append(args.since.isoformat())
+    if args.until:
+        # Inclusive of the whole day
+        conditions.append("upload_time < %s")
+        params.append((args.until + timedelta(days=1)).isoformat())
+    if args.label:
+        conditions.append(f"class_label IN ({', '.join(['%s'] * len(args.label))})")
+        params.extend(args.label)
+    if args.model_version:
+        versions = [v for v in args.model_version if v != "unknown"]
+        alternatives = ["model_version IS NULL"] if "unknown" in args.model_version else []
+        if versions:
+            alternatives.append(f"model_version IN ({', '.join(['%s'] * len(versions))})")
+            params.extend(versions)
+        conditions.append(f"({' OR '.join(alternatives)})")
+    if args.stale:
+        conditions.append("(model_version IS NULL OR model_version <> %s)")
+        params.append(current_version)
+
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute(
+            f"""SELECT video_id, user_id, file_path, proxy_path, sample_fps, max_frames, sampling_mode
+                FROM videos
+                WHERE {' AND '.join(conditions)}
+                ORDER BY video_id""" + (" LIMIT %s" if args.limit else ""),
+            tuple(params + ([args.limit] if args.limit else []))
+        )
+        return cursor.fetchall()
+    finally:
+        close_connection(conn, cursor)
+
+class Checkpoint:
+    """Videos already handled by a run, saved atomically after every batch"""
+
+    def __init__(self, path: str, run_key: str):
+        self.path = path
+        self.run_key = run_key
+        self.done = set()
+        self.failed = set()
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get("run_key") != self.run_key:
+            raise SystemExit(f"❌ {self.path} belongs to a run with other filters or another model, "
+                             "pass --restart to discard it")
+        self.done = set(data["done"])
+        self.failed = set(data["failed"])
+        return True
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"run_key": self.run_key, "done": sorted(self.done), "failed": sorted(self.failed)}, f)
+        os.replace(temp_path, self.path)
+
+def store_batch(results, model_version: str):
+    """Write a batch of successful results in one transaction"""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.executemany(
+            """UPDATE videos
+               SET class_label = %s, confidence = %s, frames_analyzed = %s, model_version = %s,
+                   processing_status = 'processed'
+               WHERE video_id = %s""",
+            [(r["label"], r["confidence"], r["frames_analyzed"], model_version, r["video_id"]) for r in results]
+        )
+        # The new feedback replaces the old report
+        ids = [r["video_id"] for r in results]
+        cursor.execute(
+            f"DELETE FROM feedback_reports WHERE video_id IN ({', '.join(['%s'] * len(ids))})",
+            tuple(ids)
+        )
+        cursor.executemany(
+            "INSERT INTO feedback_reports (video_id, user_id, feedback_text) VALUES (%s, %s, %s)",
+            [(r["video_id"], r["user_id"], r["feedback"]) for r in results]
+        )
+        timelines = [(r["video_id"], encode_segments(r["segments"])) for r in results if r["segments"]]
+        if timelines:
+            cursor.executemany(
+                """INSERT INTO video_timelines (video_id, segments)
+                   VALUES (%s, %s)
+                   ON DUPLICATE KEY UPDATE segments = VALUES(segments), created_at = CURRENT_TIMESTAMP""",
+                timelines
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        close_connection(conn, cursor)
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+class Progress:
+    def __init__(self, total: int, interval_sec: float):
+        self.total = total
+        self.interval_sec = interval_sec
+        self.completed = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last_report = 0.0
+
+    def advance(self, failed: bool):
+        self.completed += 1
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval_sec or self.completed == self.total:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        rate = self.completed / elapsed if elapsed else 0.0
+        eta = format_duration((self.total - self.completed) / rate) if rate else "?"
+        print(f"🔄 {self.completed}/{self.total} videos ({self.failed} failed), "
+              f"{rate:.2f} videos/sec, ETA {eta}")
+
+async def analyze(video):
+    """Analyze one stored video with its upload's sampling policy.
+
+    Returns a result dict, with label "failed" on errors.
+    """
+    loop = asyncio.get_running_loop()
+    result = {"video_id": video["video_id"], "user_id": video["user_id"], "segments": []}
+    if not os.path.exists(video["file_path"]):
+        return {**result, "feedback": "Video file not found", "label": "failed", "confidence": 0.0}
+    try:
+        policy = resolve_policy(video["sample_fps"], video["max_frames"], video["sampling_mode"])
+    except ValueError as e:
+        return {**result, "feedback": f"Invalid sampling policy: {e}", "label": "failed", "confidence": 0.0}
+
+    source, _ = await loop.run_in_executor(
+        None, proxy.analysis_source, video["video_id"], video["file_path"], video["proxy_path"], policy
+    )
+    timeline = TimelineRecorder() if config.TIMELINE_ENABLED else None
+    stats = ml_pipeline.AnalysisStats()
+    try:
+        # No frame observers: with ZUMBA_FRAME_CACHE_ENABLED the cached frames are used
+        feedback, label, confidence = await inference_pool.submit(
+            source, policy, (), timeline, stats, video["video_id"]
+        )
+    except Exception as e:
+        feedback, label, confidence = f"Error analyzing video: {str(e)}", "failed", 0.0
+    if timeline and label != "failed":
+        result["segments"] = timeline.segments()
+    return {**result, "feedback": feedback, "label": label, "confidence": confidence,
+            "frames_analyzed": stats.frames_analyzed}
+
+async def reanalyze(videos, args, checkpoint: Checkpoint, model_version: str):
+    queue = asyncio.Queue()
+    for video in videos:
+        queue.put_nowait(video)
+    pending = []
+    flush_lock = asyncio.Lock()
+    progress = Progress(len(videos), args.progress_interval)
+    loop = asyncio.get_running_loop()
+
+    async def flush():
+        async with flush_lock:
+            batch = pending[:]
+            pending.clear()
+            if not batch:
+                return
+            succeeded = [r for r in batch if r["label"] != "failed"]
+            if succeeded and config.ANALYSIS_MODE != "landmark" and not inference_pool.model_loaded():
+                raise SystemExit("❌ The model is not loaded, results would be simulated; nothing was written")
+            if succeeded:
+                await loop.run_in_executor(None, store_batch, succeeded, model_version)
+            # Only advanced once the batch is committed, so a crash repeats at most one batch
+            checkpoint.done.update(r["video_id"] for r in succeeded)
+            checkpoint.failed.update(r["video_id"] for r in batch if r["label"] == "failed")
+            checkpoint.save()
+
+    async def worker():
+        while not queue.empty():
+            video = queue.get_nowait()
+            result = await analyze(video)
+            if result["label"] == "failed":
+                print(f"❌ Video {video['video_id']}: {result['feedback']}")
+            pending.append(result)
+            progress.advance(result["label"] == "failed")
+            if len(pending) >= args.batch_size:
+                await flush()
+
+    inference_pool.start_pool(num_workers=args.workers)
+    try:
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        await flush()
+    finally:
+        inference_pool.stop_pool()
+    return progress
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run analysis over stored videos")
+    parser.add_argument("--since", type=date.fromisoformat, help="Uploaded on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Uploaded on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--label", nargs="+", choices=ml_pipeline.class_labels, help="Current class label")
+    parser.add_argument("--model-version", nargs="+",
+                        help="Model versions that produced the rows; 'unknown' for rows without one")
+    parser.add_argument("--stale", action="store_true", help="Only rows not produced by the current model")
+    parser.add_argument("--include-failed", action="store_true", help="Also retry rows whose analysis failed")
+    parser.add_argument("--limit", type=int, help="At most this many videos")
+    parser.add_argument("--workers", type=int, default=config.INFERENCE_WORKERS,
+                        help="Inference worker processes, 0 runs the model in this process")
+    parser.add_argument("--concurrency", type=int, default=max(1, config.ANALYSIS_WORKERS) * 2,
+                        help="Videos decoded and analyzed at the same time")
+    parser.add_argument("--batch-size", type=int, default=50, help="Results written per transaction")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: derived from the filters)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry videos that failed in this run before")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the selected videos")
+    args = parser.parse_args()
+
+    print("🎵 ZumbaFit Pro Bulk Reanalysis")
+    print("=" * 50)
+
+    model_version = ml_pipeline.model_version()
+    if not model_version:
+        print("❌ No model artifact found, nothing to reanalyze with")
+        sys.exit(1)
+
+    # The same filters with the same model make the same run; each video brings its own sampling policy
+    filters = {k: v for k, v in vars(args).items()
+               if k in ("since", "until", "label", "model_version", "stale", "include_failed", "limit")}
+    run_key = hashlib.sha256(
+        json.dumps({"filters": filters, "model_version": model_version}, default=str, sort_keys=True).encode()
+    ).hexdigest()[:16]
+    checkpoint = Checkpoint(args.checkpoint or f"reanalysis-{run_key}.json", run_key)
+    if not args.restart and checkpoint.load():
+        print(f"🔄 Resuming from {checkpoint.path}: {len(checkpoint.done)} done, {len(checkpoint.failed)} failed")
+    if args.retry_failed:
+        checkpoint.failed.clear()
+
+    videos = [v for v in select_videos(args, model_version)
+              if v["video_id"] not in checkpoint.done and v["video_id"] not in checkpoint.failed]
+    print(f"✅ {len(videos)} videos to reanalyze with model {model_version}")
+    if args.dry_run or not videos:
+        return
+
+    progress = asyncio.run(reanalyze(videos, args, checkpoint, model_version))
+
+    print("\n" + "=" * 50)
+    print(f"✅ Reanalyzed {progress.completed - progress.failed} videos in "
+          f"{format_duration(time.perf_counter() - progress.start)}, {progress.failed} failed")
+    if checkpoint.failed:
+        print(f"⚠️ Failed videos are skipped on the next run unless --retry-failed is given ({checkpoint.path})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+ZumbaFit Pro Model Registration
+Copies a model artifact into the model registry under a new version. A
+running server switches to it with POST /admin/models/{version}/activate;
+--activate instead makes it the version loaded at the next startup.
+
+Usage (from the project root):
+    python scripts/register_model.py app/models/zumba_model.h5 --version v1 --backend keras
+    python scripts/register_model.py app/models/zumba_model.tflite --version v2 --backend tflite --activate
+    python scripts/register_model.py --list
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import config
+from app.utils import model_registry
+from app.utils.backends import BACKENDS, load_backend
+
+def main():
+    parser = argparse.ArgumentParser(description="Add a model version to the registry")
+    parser.add_argument("artifact", nargs="?", help="Model file (.h5, .tflite or .onnx)")
+    parser.add_argument("--version", help="Version name, e.g. v2 or 2025-06-squat-fix")
+    parser.add_argument("--backend", choices=BACKENDS, default=config.INFERENCE_BACKEND)
+    parser.add_argument("--description", help="Free-form note shown by GET /admin/models")
+    parser.add_argument("--activate", action="store_true", help="Load this version at the next startup")
+    parser.add_argument("--skip-check", action="store_true", help="Do not check that the artifact loads")
+    parser.add_argument("--list", action="store_true", help="List registered versions and exit")
+    args = parser.parse_args()
+
+    print("🎵 ZumbaFit Pro Model Registration")
+    print("=" * 50)
+
+    if args.list:
+        active = model_registry.active_version()
+        for version in model_registry.list_versions():
+            marker = " (active)" if active and active.version == version.version else ""
+            print(f"{version.version}{marker}: {version.backend}, {version.created_at}, "
+                  f"{version.description or ''}")
+        return
+
+    if not args.artifact or not args.version:
+        parser.error("artifact and --version are required")
+    if not os.path.exists(args.artifact):
+        print(f"❌ {args.artifact} not found")
+        sys.exit(1)
+
+    if not args.skip_check:
+        try:
+            load_backend(args.backend, args.artifact)
+        except Exception as e:
+            print(f"❌ {args.artifact} does not load with the {args.backend} backend: {e}")
+            sys.exit(1)
+        print(f"✅ {args.artifact} loads with the {args.backend} backend")
+
+    try:
+        version = model_registry.register(args.artifact, args.version, args.backend, args.description)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Registered {version.version} at {os.path.dirname(version.artifact_path)}")
+
+    if args.activate:
+        model_registry.set_active(version.version)
+        print(f"✅ {version.version} is served from the next startup")
+
+if __name__ == "__main__":
+    main()